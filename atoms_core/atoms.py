@@ -16,13 +16,23 @@
 
 import os
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from atoms_core.exceptions.atom import AtomsConfigFileNotFound
 from atoms_core.entities.config import AtomsConfig
 from atoms_core.entities.atom import Atom
 from atoms_core.entities.atom_type import AtomType
 from atoms_core.entities.instance import AtomsInstance
+from atoms_core.entities.image_store import AtomsImageStore
+from atoms_core.entities.registry import AtomsRegistry
+from atoms_core.entities.inventory_event import InventoryEvent
+from atoms_core.entities.watcher import AtomsInventoryWatcher
+from atoms_core.entities.container_state import AtomsContainerStateTracker
+from atoms_core.entities.job import AtomsJob
+from atoms_core.exceptions.atom import AtomsConfigFileNotFound
 from atoms_core.utils.image import AtomsImageUtils
+from atoms_core.utils.distribution import AtomsDistributionsUtils
+from atoms_core.utils.command import CommandUtils
 from atoms_core.wrappers.client_bridge import ClientBridge
 from atoms_core.wrappers.distrobox import DistroboxWrapper
 
@@ -33,29 +43,39 @@ logger = logging.getLogger("atoms.core")
 class AtomsBackend:
     __atoms: dict
     config: AtomsConfig
+    max_jobs: int = 2
 
-    def __init__(self, distrobox_support: bool = False, client_bridge: 'ClientBridge' = None):
+    def __init__(
+        self,
+        distrobox_support: bool = False,
+        client_bridge: 'ClientBridge' = None,
+        http_client: 'HttpClient' = None,
+        atoms_fn: callable = None
+    ):
+        """
+        Atoms are listed on first access. Distrobox containers are
+        discovered in background since it can take seconds, once done
+        atoms_fn is called on the main thread with the updated atoms.
+        """
         if client_bridge is None:
             client_bridge = ClientBridge()
 
         self.__config = AtomsConfig()
-        self.__instance = AtomsInstance(self.__config, client_bridge)
+        self.__instance = AtomsInstance(
+            self.__config, client_bridge, http_client)
         self.__distrobox_support = distrobox_support
-        self.__atoms = self.__list_atoms()
+        self.__atoms_fn = atoms_fn
+        self.__atoms = None
+        self.__atoms_lock = threading.Lock()
+        self.__atoms_generation = 0
+        self.__watcher = None
+        self.__watch_event_fn = None
+        self.__jobs = []
+        self.__jobs_executor = None
+        self.__jobs_lock = threading.Lock()
 
     def __list_atoms(self) -> dict:
-        atoms = {}
-        for atom in os.listdir(self.__config.atoms_path):
-            if atom.endswith(".atom"):
-                try:
-                    atoms[atom] = Atom.load(self.__instance, atom)
-                except AtomsConfigFileNotFound:
-                    logger.warning(
-                        "Atom configuration file not found with path: {}".format(atom))
-                    continue
-
-        if self.__distrobox_support and self.has_distrobox_support:
-            atoms.update(self.__list_distrobox_atoms())
+        atoms = AtomsRegistry(self.__config).get_atoms(self.__instance)
 
         if "DEV_BASH" in os.environ:
             atoms["DEV_BASH"] = Atom.new_system_shell(self.__instance)
@@ -75,6 +95,152 @@ class AtomsBackend:
             )
         return atoms
 
+    def __discover_distrobox_atoms(self, generation: int, atoms_fn: callable):
+        try:
+            # resolve the host binaries with a single flatpak-spawn call
+            CommandUtils.which_many(
+                ["distrobox", "podman"], allow_flatpak_host=True)
+            if self.has_distrobox_support:
+                containers = self.__list_distrobox_atoms()
+            else:
+                containers = {}
+        except Exception:
+            logger.exception("Failed to list the distrobox containers")
+            return
+
+        with self.__atoms_lock:
+            # a refresh happened meanwhile, these results are outdated
+            if generation != self.__atoms_generation:
+                return
+
+            atoms = {
+                aid: atom for aid, atom in self.__atoms.items()
+                if not atom.is_distrobox_container
+            }
+            atoms.update(containers)
+            self.__atoms = atoms
+
+        if atoms_fn:
+            self.__instance.client_bridge.exec_on_main(atoms_fn, atoms)
+
+    def __load_atoms(self, atoms_fn: callable = None) -> dict:
+        atoms = self.__list_atoms()
+
+        with self.__atoms_lock:
+            self.__atoms_generation += 1
+            generation = self.__atoms_generation
+            if self.__atoms is not None:
+                # keep the known containers until discovery completes
+                atoms.update({
+                    aid: atom for aid, atom in self.__atoms.items()
+                    if atom.is_distrobox_container
+                })
+            self.__atoms = atoms
+
+        if self.__distrobox_support:
+            threading.Thread(
+                target=self.__discover_distrobox_atoms,
+                args=(generation, atoms_fn),
+                daemon=True
+            ).start()
+
+        return atoms
+
+    def refresh(self) -> dict:
+        """
+        Reload the atoms, waiting for the distrobox containers.
+        """
+        atoms = self.__list_atoms()
+        if self.__distrobox_support and self.has_distrobox_support:
+            atoms.update(self.__list_distrobox_atoms())
+
+        with self.__atoms_lock:
+            self.__atoms_generation += 1
+            self.__atoms = atoms
+
+        return atoms
+
+    def refresh_async(self, atoms_fn: callable = None) -> dict:
+        """
+        Reload the atoms, the chroot ones are returned immediately while
+        the distrobox containers are discovered in background, atoms_fn
+        (or the one passed to the backend) is then called on the main
+        thread with the updated atoms.
+        """
+        return self.__load_atoms(atoms_fn or self.__atoms_fn)
+
+    def start_watching(self, event_fn: callable = None):
+        """
+        Keep atoms up to date with the atoms and images paths. For each
+        change, event_fn is called on the main thread with the
+        InventoryEvent, the atom or image name and the loaded Atom or
+        AtomImage (None when removed). Calling it again while watching
+        replaces event_fn.
+        """
+        self.__watch_event_fn = event_fn
+        if self.__watcher is None:
+            self.__watcher = AtomsInventoryWatcher(
+                self.__config, self.__on_inventory_event)
+        self.__watcher.start()
+
+    def stop_watching(self):
+        if self.__watcher is not None:
+            self.__watcher.stop()
+
+    def __on_inventory_event(self, event: InventoryEvent, name: str):
+        event_fn = self.__watch_event_fn
+        item = None
+
+        if event in [InventoryEvent.ATOM_ADDED, InventoryEvent.ATOM_CHANGED]:
+            try:
+                item = Atom.load(self.__instance, name)
+            except AtomsConfigFileNotFound:
+                return
+        elif event in [
+            InventoryEvent.IMAGE_ADDED,
+            InventoryEvent.IMAGE_REMOVED,
+            InventoryEvent.IMAGE_CHANGED
+        ]:
+            # keeps local_images up to date without checking every image
+            item = AtomsImageUtils.update_image(self.__config, name)
+
+        if event in [
+            InventoryEvent.ATOM_ADDED,
+            InventoryEvent.ATOM_REMOVED,
+            InventoryEvent.ATOM_CHANGED
+        ]:
+            with self.__atoms_lock:
+                # not loaded yet, the first access will list it anyway
+                if self.__atoms is None:
+                    return
+                # copied so who is iterating the current atoms is not affected
+                atoms = dict(self.__atoms)
+                if item is None:
+                    atoms.pop(name, None)
+                else:
+                    atoms[name] = item
+                self.__atoms = atoms
+
+        if event_fn:
+            self.__instance.client_bridge.exec_on_main(
+                event_fn, event, name, item)
+
+    def start_tracking_containers(self, state_fn: callable = None):
+        """
+        Track the state of the distrobox containers from the container
+        engine events, see AtomsContainerStateTracker. Changes are pushed
+        to state_fn(container_id, state) on the main thread and exposed
+        by Atom.container_state.
+        """
+        if self.__instance.container_tracker is None:
+            self.__instance.container_tracker = AtomsContainerStateTracker(
+                self.__instance, state_fn)
+        self.__instance.container_tracker.start()
+
+    def stop_tracking_containers(self):
+        if self.__instance.container_tracker is not None:
+            self.__instance.container_tracker.stop()
+
     def request_new_atom(
         self,
         name: str,
@@ -88,12 +254,14 @@ class AtomsBackend:
         unpack_fn: callable = None,
         distrobox_fn: callable = None,
         finalizing_fn: callable = None,
-        error_fn: callable = None
+        error_fn: callable = None,
+        layered: bool = False
     ):
         if atom_type == AtomType.ATOM_CHROOT:
             return Atom.new(
                 self.__instance, name, distribution, architecture, release,
-                download_fn, config_fn, unpack_fn, finalizing_fn, error_fn
+                download_fn, config_fn, unpack_fn, finalizing_fn, error_fn,
+                layered
             )
         if atom_type == AtomType.DISTROBOX_CONTAINER:
             return Atom.new_container(
@@ -101,13 +269,66 @@ class AtomsBackend:
                 finalizing_fn, error_fn
             )
 
+    def create_atom(
+        self,
+        name: str,
+        atom_type: 'AtomType',
+        distribution: 'AtomDistribution' = None,
+        architecture: str = None,
+        release: str = None,
+        container_image: str = None,
+        stage_fn: callable = None,
+        progress_fn: callable = None,
+        layered: bool = False
+    ) -> AtomsJob:
+        """
+        Queue the creation of an atom and return its AtomsJob, which can be
+        used to follow, cancel or wait for it. At most max_jobs atoms are
+        created at the same time, the others wait in the queue.
+        """
+        job = AtomsJob(self.__instance, name, stage_fn, progress_fn)
+
+        if atom_type == AtomType.ATOM_CHROOT:
+            args = (Atom.new, self.__instance, name, distribution,
+                    architecture, release)
+            kwargs = {"layered": layered}
+        else:
+            args = (Atom.new_container, self.__instance, name, container_image)
+            kwargs = {}
+
+        with self.__jobs_lock:
+            if self.__jobs_executor is None:
+                self.__jobs_executor = ThreadPoolExecutor(
+                    max_workers=max(1, self.max_jobs),
+                    thread_name_prefix="atoms-job")
+            self.__jobs = [j for j in self.__jobs if not j.is_done] + [job]
+            self.__jobs_executor.submit(job.run, *args, **kwargs)
+
+        return job
+
+    @property
+    def jobs(self) -> list:
+        """The jobs not done yet."""
+        with self.__jobs_lock:
+            return [job for job in self.__jobs if not job.is_done]
+
+    def refresh_catalog(self, max_workers: int = 8) -> 'AtomsCatalogSnapshot':
+        """
+        Resolve the latest remote image of every available distribution,
+        see AtomsDistributionsUtils.refresh_catalog.
+        """
+        return AtomsDistributionsUtils.refresh_catalog(
+            self.__instance, max_workers=max_workers)
+
     @property
     def atoms(self) -> dict:
+        if self.__atoms is None:
+            self.__load_atoms(self.__atoms_fn)
         return self.__atoms
 
     @property
     def has_atoms(self) -> bool:
-        return len(self.__atoms) > 0
+        return len(self.atoms) > 0
 
     @property
     def local_images(self) -> dict:
@@ -117,13 +338,24 @@ class AtomsBackend:
     def local_images_grouped(self) -> dict:
         return AtomsImageUtils.get_image_list_grouped(self.__config)
 
+    @property
+    def image_store(self) -> 'AtomsImageStore':
+        return AtomsImageStore(self.__config)
+
+    def collect_images(self, dry_run: bool = False) -> 'ResultModel':
+        """
+        Remove unused images and cached rootfs trees, see
+        AtomsImageStore.collect.
+        """
+        return self.image_store.collect(dry_run)
+
     @property
     def has_distrobox_support(self) -> bool:
         return DistroboxWrapper().is_supported
 
     @property
     def client_bridge(self) -> 'ClientBridge':
-        return self.__client_bridge
+        return self.__instance.client_bridge
 
     @property
     def instance(self) -> 'AtomsInstance':
@@ -19,22 +19,29 @@ import uuid
 import shutil
 import orjson
 import tempfile
+import threading
 import datetime
 import importlib
 
-from atoms_core.exceptions.atom import AtomsWrongAtomData, AtomsConfigFileNotFound
+from atoms_core.exceptions.atom import AtomsWrongAtomData, AtomsConfigFileNotFound, \
+    AtomsLayersNotSupported
 from atoms_core.exceptions.download import AtomsHashMissmatchError
 from atoms_core.exceptions.image import AtomsFailToDownloadImage
 from atoms_core.exceptions.distribution import AtomsUnreachableRemote, AtomsMisconfiguredDistribution
 from atoms_core.exceptions.podman import AtomsFailToCreateContainer
+from atoms_core.exceptions.job import AtomsJobCancelled
 from atoms_core.utils.image import AtomsImageUtils
+from atoms_core.entities.image_store import AtomsImageStore
 from atoms_core.utils.paths import AtomsPathsUtils
 from atoms_core.utils.command import CommandUtils
 from atoms_core.utils.file import FileUtils
+from atoms_core.utils.rootfs import RootfsCache
 from atoms_core.wrappers.proot import ProotWrapper
+from atoms_core.wrappers.fuse_overlayfs import FuseOverlayfsWrapper
 from atoms_core.wrappers.servicectl import ServicectlWrapper
 from atoms_core.wrappers.distrobox import DistroboxWrapper
 from atoms_core.models.atom import AtomModel
+from atoms_core.entities.job_stage import JobStage
 
 
 class Atom(AtomModel):
@@ -54,6 +61,7 @@ class Atom(AtomModel):
         bind_icons: bool = False,
         bind_fonts: bool = False,
         bind_extra_mounts: list = None,
+        layers: list = None,
     ):
         super().__init__(
             instance,
@@ -69,6 +77,7 @@ class Atom(AtomModel):
             bind_icons,
             bind_fonts,
             bind_extra_mounts,
+            layers,
         )
 
         if container_id:
@@ -82,7 +91,8 @@ class Atom(AtomModel):
             "bindThemes": False,
             "bindIcons": False,
             "bindFonts": False,
-            "bindExtraMounts": []
+            "bindExtraMounts": [],
+            "layers": []
         }
 
     @classmethod
@@ -110,7 +120,8 @@ class Atom(AtomModel):
             bind_themes=data['bindThemes'],
             bind_icons=data['bindIcons'],
             bind_fonts=data['bindFonts'],
-            bind_extra_mounts=data['bindExtraMounts']
+            bind_extra_mounts=data['bindExtraMounts'],
+            layers=data['layers']
         )
 
     @classmethod
@@ -153,90 +164,178 @@ class Atom(AtomModel):
         config_fn: callable = None,
         unpack_fn: callable = None,
         finalizing_fn: callable = None,
-        error_fn: callable = None
+        error_fn: callable = None,
+        layered: bool = False,
+        job: 'AtomsJob' = None
     ) -> 'Atom':
-        # Get image
+        """
+        Create a new atom, returns None on failure. When running as a job,
+        stages, download progress and errors are also reported to it and
+        a cancellation raises AtomsJobCancelled or AtomsDownloadCancelled.
+        If anything fails once the atom directory exists, it is removed.
+        """
+        def report_error(message: str):
+            if job:
+                job.set_error(message)
+            if error_fn:
+                instance.client_bridge.exec_on_main(error_fn, message)
+
+        # layered atoms write in their upper layer only through the
+        # overlay, their base is shared and must never be modified
+        if layered and not FuseOverlayfsWrapper().is_supported:
+            report_error(str(AtomsLayersNotSupported(name)))
+            return
+
+        rootfs_cache = RootfsCache(instance.config)
+
+        def create_atom(layers: list = None) -> 'Atom':
+            date = datetime.datetime.now().isoformat()
+            relative_path = str(uuid.uuid4()) + ".atom"
+            atom = cls(
+                instance, name, distribution.distribution_id,
+                relative_path, date,
+                bind_themes=False,
+                bind_icons=False,
+                bind_fonts=False,
+                bind_extra_mounts=[],
+                layers=layers
+            )
+            os.makedirs(atom.fs_path)
+            return atom
+
+        # Get image, unless disabled, a missing image is extracted while it
+        # downloads, see ATOMS_NO_PIPELINED_UNPACK: in the rootfs cache when
+        # the tree is kept there, see RootfsCache.clone_to, otherwise
+        # straight in the chroot of the atom, which is removed on failure
+        if job:
+            job.set_stage(JobStage.DOWNLOADING)
+
+        pipelined = "ATOMS_NO_PIPELINED_UNPACK" not in os.environ
+        cached = layered or ("ATOMS_NO_ROOTFS_CACHE" not in os.environ
+                             and rootfs_cache.supports_reflink)
+        atom = create_atom() if pipelined and not cached else None
+
         try:
-            image = AtomsImageUtils.get_image(
-                instance, distribution, architecture, release, download_fn)
+            try:
+                image = AtomsImageUtils.get_image(
+                    instance, distribution, architecture, release, download_fn,
+                    sinks=[job.update_download] if job else None,
+                    cancel_event=job.cancel_event if job else None,
+                    rootfs_cache=rootfs_cache if pipelined and cached else None,
+                    unpack_to=atom.fs_path if atom else None)
+            except BaseException:
+                if atom:
+                    FileUtils.native_rm(atom.path)
+                raise
         except AtomsHashMissmatchError:
-            if error_fn:
-                instance.client_bridge.exec_on_main(
-                    error_fn, "Hash missmatch.")
+            report_error("Hash missmatch.")
             return
         except AtomsFailToDownloadImage:
-            if error_fn:
-                instance.client_bridge.exec_on_main(
-                    error_fn, "Fail to download image, it might be a temporary problem.")
+            report_error(
+                "Fail to download image, it might be a temporary problem.")
             return
         except AtomsUnreachableRemote:
-            if error_fn:
-                instance.client_bridge.exec_on_main(
-                    error_fn, "Unreachable remote, it might be a temporary problem.")
+            report_error(
+                "Unreachable remote, it might be a temporary problem.")
             return
         except AtomsMisconfiguredDistribution as e:
-            if error_fn:
-                instance.client_bridge.exec_on_main(error_fn, str(e))
+            report_error(str(e))
             return
 
         # Create configuration
+        if job:
+            job.set_stage(JobStage.CONFIGURING)
         if config_fn:
             instance.client_bridge.exec_on_main(config_fn, 0)
 
-        date = datetime.datetime.now().isoformat()
-        relative_path = str(uuid.uuid4()) + ".atom"
-        atom_path = AtomsPathsUtils.get_atom_path(
-            instance.config, relative_path)
-        chroot_path = os.path.join(atom_path, "chroot")
-        atom = cls(
-            instance, name, distribution.distribution_id,
-            relative_path, date,
-            bind_themes=False,
-            bind_icons=False,
-            bind_fonts=False,
-            bind_extra_mounts=[]
-        )
-        os.makedirs(chroot_path)
+        unpacked = atom is not None
+        if atom is None:
+            atom = create_atom([image.digest] if layered else None)
 
-        # make some extra/common paths
+        try:
+            cls.__populate(
+                instance, atom, image, distribution, rootfs_cache, layered,
+                unpacked, config_fn, unpack_fn, finalizing_fn, job)
+        except BaseException:
+            FileUtils.native_rm(atom.path)
+            raise
+
+        if finalizing_fn:
+            instance.client_bridge.exec_on_main(finalizing_fn, 1)
+
+        return atom
+
+    @staticmethod
+    def __populate(
+        instance: 'AtomsInstance',
+        atom: 'Atom',
+        image: 'AtomImage',
+        distribution: 'AtomDistribution',
+        rootfs_cache: RootfsCache,
+        layered: bool,
+        unpacked: bool,
+        config_fn: callable,
+        unpack_fn: callable,
+        finalizing_fn: callable,
+        job: 'AtomsJob'
+    ):
+        chroot_path = atom.fs_path
+
+        # make some extra/common paths, layered atoms do not get the dri
+        # ones since they would shadow the base in the upper layer
         os.makedirs(os.path.join(chroot_path, "root"), exist_ok=True)
-        os.makedirs(os.path.join(
-            chroot_path, "usr/lib/xorg/modules/dri"), exist_ok=True)
-        os.makedirs(os.path.join(chroot_path, "usr/lib64/dri"), exist_ok=True)
+        if not layered:
+            os.makedirs(os.path.join(
+                chroot_path, "usr/lib/xorg/modules/dri"), exist_ok=True)
+            os.makedirs(os.path.join(chroot_path, "usr/lib64/dri"), exist_ok=True)
 
         if config_fn:
             instance.client_bridge.exec_on_main(config_fn, 1)
 
         # Unpack image
+        if job:
+            job.set_stage(JobStage.UNPACKING)
         if unpack_fn:
             instance.client_bridge.exec_on_main(unpack_fn, 0)
 
-        image.unpack(chroot_path)
+        # images are extracted once in the rootfs cache and cloned from
+        # there, set ATOMS_NO_ROOTFS_CACHE to extract them directly. Layered
+        # atoms only get a copy of the mutable paths, the rest is shared
+        if layered:
+            rootfs_cache.prepare_upper(image, chroot_path)
+        elif unpacked:
+            # already extracted while it downloaded
+            pass
+        elif "ATOMS_NO_ROOTFS_CACHE" in os.environ:
+            image.unpack(chroot_path)
+        else:
+            rootfs_cache.clone_to(image, chroot_path)
 
         if unpack_fn:
             instance.client_bridge.exec_on_main(unpack_fn, 1)
 
         # Finalize and distro specific workarounds
+        if job:
+            job.set_stage(JobStage.FINALIZING)
+
         # install servicectl to be able to manage services in the chroot
-        ServicectlWrapper().install_to_path(os.path.join(atom.fs_path, "usr/local/bin"))
-        ServicectlWrapper().link_to_systemctl(atom.fs_path)
+        servicectl = ServicectlWrapper()
+        servicectl.install_to_path(os.path.join(atom.fs_path, "usr/local/bin"))
+        servicectl.link_to_systemctl(atom.fs_path)
 
         if finalizing_fn:
             instance.client_bridge.exec_on_main(finalizing_fn, 0)
 
         # run post unpack if any
-        distribution.post_unpack(chroot_path)
+        distribution.post_unpack(chroot_path, instance)
 
         # set custom motd if any
         distribution.set_motd(chroot_path)
 
         # save atom configuration
         atom.save()
-
-        if finalizing_fn:
-            instance.client_bridge.exec_on_main(finalizing_fn, 1)
-
-        return atom
+        AtomsImageStore(instance.config).add_ref(
+            atom.relative_path, image.name)
 
     @classmethod
     def new_container(
@@ -246,24 +345,41 @@ class Atom(AtomModel):
         container_image: str,
         distrobox_fn: callable = None,
         finalizing_fn: callable = None,
-        error_fn: callable = None
+        error_fn: callable = None,
+        job: 'AtomsJob' = None
     ) -> 'Atom':
+        """
+        Create a new distrobox container, returns None on failure. The
+        creation can not be interrupted, when running as a cancelled job
+        the container is destroyed once created.
+        """
         # Distrobox container creation
+        if job:
+            job.set_stage(JobStage.CREATING_CONTAINER)
         if distrobox_fn:
             instance.client_bridge.exec_on_main(distrobox_fn, 0)
 
+        distrobox_wrapper = DistroboxWrapper()
         try:
-            container_id = DistroboxWrapper().new_container(name, container_image)
+            container_id = distrobox_wrapper.new_container(name, container_image)
         except AtomsFailToCreateContainer:
+            message = "Fail to create container, it might be a temporary problem or a wrong image was requested."
+            if job:
+                job.set_error(message)
             if error_fn:
-                instance.client_bridge.exec_on_main(
-                    error_fn, "Fail to create container, it might be a temporary problem or a wrong image was requested.")
+                instance.client_bridge.exec_on_main(error_fn, message)
             return
 
+        if job and job.is_cancelled:
+            distrobox_wrapper.destroy_container(container_id, name)
+            raise AtomsJobCancelled(name)
+
         if distrobox_fn:
             instance.client_bridge.exec_on_main(distrobox_fn, 1)
 
         # Finalizing
+        if job:
+            job.set_stage(JobStage.FINALIZING)
         if finalizing_fn:
             instance.client_bridge.exec_on_main(finalizing_fn, 0)
 
@@ -294,7 +410,8 @@ class Atom(AtomModel):
             "bindThemes": self._bind_themes,
             "bindIcons": self._bind_icons,
             "bindFonts": self._bind_fonts,
-            "bindExtraMounts": self._bind_extra_mounts
+            "bindExtraMounts": self._bind_extra_mounts,
+            "layers": self._layers
         }
 
     def save(self):
@@ -327,9 +444,15 @@ class Atom(AtomModel):
         if environment is None:
             environment = []
 
-        _command = self.__proot_wrapper.get_proot_command_for_chroot(
-            self.fs_path, command, bind_mounts=self.bind_mounts
-        )
+        if self.is_layered:
+            _command = self.__proot_wrapper.get_proot_command_for_layers(
+                self.lower_paths, self.upper_path, self.work_path,
+                self.merged_path, command, bind_mounts=self.bind_mounts
+            )
+        else:
+            _command = self.__proot_wrapper.get_proot_command_for_chroot(
+                self.fs_path, command, bind_mounts=self.bind_mounts
+            )
         return _command, environment, self.root_path
 
     def __generate_distrobox_command(self, command: list, environment: list = None) -> tuple:
@@ -369,25 +492,43 @@ done
         #       then remove the directory, but since Atoms has a no track
         #       of the proot process, this is the best we can do for now.
         binary_path = shutil.which("rm")
+        if self.is_layered:
+            FuseOverlayfsWrapper().unmount(self.merged_path)
         FileUtils.native_rm(self.path)
-
-    def kill(self):
+        AtomsImageStore(self._instance.config).remove_ref(self._relative_path)
+
+    def kill(self, done_fn: callable = None):
+        """
+        Stop the atom. Distrobox containers are stopped in background,
+        done_fn is called on the main thread with the atom once the stop
+        command finished; the state change is also reported by the
+        container tracker, if any.
+        """
         if self.is_distrobox_container or self._system_shell:
-            self.__distrobox_wrapper.stop_container(self._container_id)
+            self.stop_distrobox_container(done_fn)
             return
 
         pids = ProcUtils.find_proc_by_cmdline(self._relative_path)
         for pid in pids:
             pid.kill()
 
+        if self.is_layered:
+            FuseOverlayfsWrapper().unmount(self.merged_path)
+
     def rename(self, new_name: str):
         if self.is_distrobox_container or self._system_shell:
             raise AtomsCannotRenamePodmanContainers()
         self._name = new_name
         self.save()
 
-    def stop_distrobox_container(self):
-        self.__distrobox_wrapper.stop_container(self._container_id)
+    def stop_distrobox_container(self, done_fn: callable = None):
+        def stop():
+            # blocks until the container is stopped
+            self.__distrobox_wrapper.stop_container(self._container_id)
+            if done_fn:
+                self._instance.client_bridge.exec_on_main(done_fn, self)
+
+        threading.Thread(target=stop, daemon=True).start()
 
     def set_bind_themes(self, status: bool):
         self._bind_themes = status
@@ -0,0 +1,196 @@
+# catalog.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import orjson
+import logging
+import datetime
+import threading
+import requests
+
+from atoms_core.params.paths import AtomsPaths
+from atoms_core.exceptions.distribution import AtomsUnreachableRemote
+
+
+logger = logging.getLogger("atoms.catalog")
+
+
+class AtomsRemoteCatalog:
+    """
+    Persistent cache of the remote metadata needed to create atoms, stored
+    in AtomsPaths.catalog_file. It keeps:
+    - resources: the content of remote text files (image listings, hash
+      files) with their ETag and Last-Modified, so they can be revalidated
+      with a conditional request and served when the remote is unreachable;
+    - builds: the last resolution of each distribution, release and
+      architecture (remote URL, hash file URL, hash and image name), so
+      clients can show them without any remote call.
+    """
+    __default: "AtomsRemoteCatalog" = None
+    __default_lock = threading.Lock()
+
+    def __init__(self, path: str = None):
+        if path is None:
+            path = AtomsPaths.catalog_file
+
+        self.path = path
+        self.__data = None
+        self.__lock = threading.RLock()
+
+    @classmethod
+    def get_default(cls) -> "AtomsRemoteCatalog":
+        """
+        Returns a process wide catalog, used by the components which are
+        not bound to an AtomsInstance.
+        """
+        with cls.__default_lock:
+            if cls.__default is None:
+                cls.__default = cls()
+            return cls.__default
+
+    @property
+    def __entries(self) -> dict:
+        if self.__data is None:
+            self.__data = self.__load()
+        return self.__data
+
+    def __load(self) -> dict:
+        data = {"resources": {}, "builds": {}}
+        if not os.path.exists(self.path):
+            return data
+
+        try:
+            with open(self.path, "rb") as f:
+                data.update(orjson.loads(f.read()))
+        except (OSError, orjson.JSONDecodeError):
+            logger.warning(f"Discarding unreadable catalog: {self.path}")
+
+        return data
+
+    def __save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(orjson.dumps(self.__entries))
+        os.replace(temp_path, self.path)
+
+    def get_text(self, http_client: "HttpClient", url: str) -> str:
+        """
+        Returns the content of a remote text file. A cached copy is
+        revalidated with If-None-Match/If-Modified-Since and served as is
+        on 304, or when the remote cannot be reached.
+        """
+        with self.__lock:
+            entry = self.__entries["resources"].get(url)
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("lastModified"):
+                headers["If-Modified-Since"] = entry["lastModified"]
+
+        try:
+            response = http_client.get(url, headers=headers)
+        except requests.exceptions.RequestException:
+            if entry is None:
+                raise AtomsUnreachableRemote(url)
+            logger.warning(f"Remote unreachable, using the cached copy of {url}")
+            return entry["content"]
+
+        if response.status_code == 304 and entry is not None:
+            return entry["content"]
+
+        if response.status_code != 200:
+            if entry is not None and response.status_code >= 500:
+                logger.warning(f"Remote unavailable, using the cached copy of {url}")
+                return entry["content"]
+            raise AtomsUnreachableRemote(url)
+
+        with self.__lock:
+            self.__entries["resources"][url] = {
+                "content": response.text,
+                "etag": response.headers.get("etag"),
+                "lastModified": response.headers.get("last-modified"),
+                "fetched": datetime.datetime.now().isoformat(),
+            }
+            self.__save()
+
+        return response.text
+
+    def get_build(self, distribution_id: str, release: str, architecture: str) -> dict:
+        """Returns the last known resolution, None if never resolved."""
+        with self.__lock:
+            return self.__entries["builds"].get(
+                self.__build_key(distribution_id, release, architecture))
+
+    def set_build(self, distribution_id: str, release: str, architecture: str, info: dict):
+        key = self.__build_key(distribution_id, release, architecture)
+
+        with self.__lock:
+            current = dict(self.__entries["builds"].get(key, {}))
+            current.pop("updated", None)
+            if current == info:
+                return
+
+            info = dict(info)
+            info["updated"] = datetime.datetime.now().isoformat()
+            self.__entries["builds"][key] = info
+            self.__save()
+
+    def invalidate(self):
+        """Forget every cached resource and build."""
+        with self.__lock:
+            self.__data = {"resources": {}, "builds": {}}
+            self.__save()
+
+    @staticmethod
+    def __build_key(distribution_id: str, release: str, architecture: str) -> str:
+        return f"{distribution_id}/{release}/{architecture}"
+
+
+class AtomsCatalogSnapshot:
+    """
+    Result of a catalog refresh: one ResultModel per (distribution_id,
+    release, architecture), holding the resolution as data on success or
+    the error message on failure.
+    """
+
+    def __init__(self, results: dict):
+        self.date = datetime.datetime.now().isoformat()
+        self.__results = results
+
+    @property
+    def results(self) -> dict:
+        return self.__results
+
+    @property
+    def entries(self) -> dict:
+        return {
+            key: result.data for key, result in self.__results.items()
+            if result.status
+        }
+
+    @property
+    def errors(self) -> dict:
+        return {
+            key: result.message for key, result in self.__results.items()
+            if not result.status
+        }
+
+    @property
+    def has_errors(self) -> bool:
+        return len(self.errors) > 0
@@ -27,6 +27,8 @@ class AtomsConfig:
     def __init__(self):
         self.atoms_path = AtomsPaths.atoms
         self.atoms_images = AtomsPaths.images
+        self.images_max_size = None
+        self.images_max_age = None
         self.__load()
 
     def __load(self):
@@ -42,6 +44,12 @@ class AtomsConfig:
         if config.get("images.path"):
             self.atoms_images = config["images.path"]
 
+        if config.get("images.maxSize"):
+            self.images_max_size = int(config["images.maxSize"])
+
+        if config.get("images.maxAge"):
+            self.images_max_age = int(config["images.maxAge"])
+
         if not os.path.exists(self.atoms_path):
             try:
                 os.makedirs(self.atoms_path)
@@ -60,12 +68,24 @@ class AtomsConfig:
             f.write(orjson.dumps(self.to_dict(), f,
                     option=orjson.OPT_NON_STR_KEYS))
 
+    @property
+    def rootfs_cache_path(self) -> str:
+        """
+        Where extracted images are cached, it lives in the atoms path so
+        atoms can be cloned from it on the same filesystem.
+        """
+        return os.path.join(self.atoms_path, ".rootfs")
+
     def to_dict(self) -> dict:
         conf = {}
         if self.atoms_path != AtomsPaths.atoms:
             conf["atoms.path"] = self.atoms_path
         if self.atoms_images != AtomsPaths.images:
             conf["images.path"] = self.atoms_images
+        if self.images_max_size is not None:
+            conf["images.maxSize"] = self.images_max_size
+        if self.images_max_age is not None:
+            conf["images.maxAge"] = self.images_max_age
         return conf
 
     def restore_default(self, config_key: str):
@@ -73,6 +93,10 @@ class AtomsConfig:
             self.atoms_path = AtomsPaths.atoms
         elif config_key == "images.path":
             self.atoms_images = AtomsPaths.images
+        elif config_key == "images.maxSize":
+            self.images_max_size = None
+        elif config_key == "images.maxAge":
+            self.images_max_age = None
         else:
             raise AtomsConfigKeyNotFound(config_key)
 
@@ -83,6 +107,10 @@ class AtomsConfig:
             return self.atoms_path == AtomsPaths.atoms
         elif config_key == "images.path":
             return self.atoms_images == AtomsPaths.images
+        elif config_key == "images.maxSize":
+            return self.images_max_size is None
+        elif config_key == "images.maxAge":
+            return self.images_max_age is None
         return False
 
     def set_value(self, config_key: str, config_value: str):
@@ -90,6 +118,12 @@ class AtomsConfig:
             self.atoms_path = config_value
         elif config_key == "images.path":
             self.atoms_images = config_value
+        elif config_key == "images.maxSize":
+            # bytes
+            self.images_max_size = int(config_value)
+        elif config_key == "images.maxAge":
+            # days
+            self.images_max_age = int(config_value)
         else:
             raise AtomsConfigKeyNotFound(config_key)
 
@@ -0,0 +1,182 @@
+# container_state.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import orjson
+import logging
+import threading
+import subprocess
+
+from atoms_core.utils.command import CommandUtils
+from atoms_core.wrappers.distrobox import DistroboxWrapper
+
+
+logger = logging.getLogger("atoms.container_state")
+
+# container engine event -> resulting state, other events do not change it;
+# podman and docker name some of them differently (died/die, remove/destroy)
+EVENT_STATES = {
+    "create": "created",
+    "init": "created",
+    "start": "running",
+    "restart": "running",
+    "unpause": "running",
+    "pause": "paused",
+    "died": "exited",
+    "die": "exited",
+    "stop": "exited",
+    "remove": "removed",
+    "destroy": "removed",
+}
+
+
+class AtomsContainerStateTracker:
+    """
+    Keeps the state (created, running, paused, exited) of the distrobox
+    containers, seeded from a listing and then updated by the container
+    engine event stream ('podman events --format json', or docker) read
+    on a background thread. Every change is pushed to state_fn through
+    ClientBridge.exec_on_main as state_fn(container_id, state), removed
+    containers have the "removed" state.
+    """
+
+    def __init__(self, instance: "AtomsInstance", state_fn: callable = None):
+        self.__instance = instance
+        self.__state_fn = state_fn
+        self.__states = {}
+        self.__condition = threading.Condition()
+        self.__process = None
+        self.__thread = None
+        self.__stopping = False
+
+    @property
+    def is_running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    @property
+    def states(self) -> dict:
+        with self.__condition:
+            return dict(self.__states)
+
+    def get_state(self, container_id: str) -> str:
+        with self.__condition:
+            return self.__states.get(container_id[:12])
+
+    @staticmethod
+    def __get_events_command() -> list:
+        engines = ["podman", "docker"]
+        if os.environ.get("DBX_CONTAINER_MANAGER") in engines:
+            engines = [os.environ["DBX_CONTAINER_MANAGER"]]
+
+        paths = CommandUtils.which_many(engines, allow_flatpak_host=True)
+        for engine in engines:
+            if paths[engine] is None:
+                continue
+            return CommandUtils.get_valid_command([
+                paths[engine], "events",
+                "--filter", "type=container",
+                "--filter", "label=manager=distrobox",
+                "--format", "json" if engine == "podman" else "{{json .}}",
+            ], allow_flatpak_host=True)
+
+    def start(self):
+        if self.is_running:
+            return
+
+        command = self.__get_events_command()
+        if command is None:
+            logger.info("No container engine found, states are not tracked")
+            return
+
+        # the stream is opened before listing, so no change is missed
+        self.__stopping = False
+        self.__process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+        try:
+            containers = DistroboxWrapper().get_containers()
+        except BaseException:
+            self.__process.terminate()
+            self.__process.wait()
+            self.__process = None
+            raise
+
+        for container_id, info in containers.items():
+            if info.get("state"):
+                self.__set_state(container_id, info["state"])
+
+        self.__thread = threading.Thread(target=self.__read, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stopping = True
+        if self.__process is not None:
+            self.__process.terminate()
+            self.__process.wait()
+            self.__process = None
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __read(self):
+        for line in self.__process.stdout:
+            try:
+                event = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue
+
+            # podman and docker use different keys
+            container_id = event.get("ID") or event.get("id")
+            status = event.get("Status") or event.get("status") \
+                or event.get("Action")
+            if not container_id or status not in EVENT_STATES:
+                continue
+
+            self.__set_state(container_id, EVENT_STATES[status])
+
+        if not self.__stopping:
+            logger.warning("The container events stream ended")
+
+    def __set_state(self, container_id: str, state: str):
+        container_id = container_id[:12]
+
+        with self.__condition:
+            if self.__states.get(container_id) == state:
+                return
+            if state == "removed":
+                self.__states.pop(container_id, None)
+            else:
+                self.__states[container_id] = state
+            self.__condition.notify_all()
+
+        if self.__state_fn:
+            self.__instance.client_bridge.exec_on_main(
+                self.__state_fn, container_id, state)
+
+    def wait_for(
+        self, container_id: str, states: list, timeout: float = None
+    ) -> bool:
+        """
+        Wait until the container reaches one of states, returns False on
+        timeout. Use "removed" to wait for a container to be removed.
+        """
+        container_id = container_id[:12]
+
+        def reached() -> bool:
+            return self.__states.get(container_id, "removed") in states
+
+        with self.__condition:
+            return self.__condition.wait_for(reached, timeout)
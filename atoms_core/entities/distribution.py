@@ -18,15 +18,22 @@
 import os
 import re
 import uuid
-import requests
 import tempfile
 
 from atoms_core.exceptions.distribution import AtomsUnreachableRemote, AtomsMisconfiguredDistribution
 from atoms_core.utils.command import CommandUtils
+from atoms_core.utils.download import ChunkReader
 from atoms_core.utils.hash import HashUtils
+from atoms_core.utils.cache import TTLCache
+from atoms_core.wrappers.http_client import HttpClient
+from atoms_core.entities.catalog import AtomsRemoteCatalog
 
 
 class AtomDistribution:
+    # latest remote builds, keyed by (distribution_id, release, architecture),
+    # shared by all distributions so resolving an image once is enough for
+    # all the get_remote* calls made while creating an atom
+    remote_builds = TTLCache(ttl=600)
 
     def __init__(
         self,
@@ -62,36 +69,48 @@ class AtomDistribution:
     def __str__(self):
         return f"Distribution {self.name}"
 
-    def get_remote(self, architecture: str, release: str) -> str:
+    # distributions are shared singletons (see AtomsDistributionRegistry),
+    # so the instance is passed to each remote call instead of being stored
+    # on them: its HTTP client and remote catalog are used, or the default
+    # ones when it is None
+
+    @staticmethod
+    def _get_http_client(instance: "AtomsInstance" = None) -> HttpClient:
+        if instance is not None:
+            return instance.http_client
+        return HttpClient.get_default()
+
+    @staticmethod
+    def _get_catalog(instance: "AtomsInstance" = None) -> AtomsRemoteCatalog:
+        if instance is not None:
+            return instance.catalog
+        return AtomsRemoteCatalog.get_default()
+
+    def get_remote(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
         return self.remote_structure.format(release, architecture)
 
-    def get_remote_hash(self, architecture: str, release: str) -> str:
+    def get_remote_hash(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
         if self.remote_hash_structure is None:
             return
 
         return self.remote_hash_structure.format(release, architecture)
 
-    def get_image_name(self, architecture: str, release: str) -> str:
+    def get_image_name(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
         remote = HashUtils.get_string_hash(
-            self.get_remote(architecture, release), "sha1")
+            self.get_remote(architecture, release, instance), "sha1")
         _repr = f"{self.distribution_id}-{release}-{architecture}-{remote}"
         return _repr.replace(".", "-").replace("_", "-").replace(" ", "-").lower()
 
-    def get_remote_image_name(self, architecture: str, release: str) -> str:
-        remote = self.get_remote(architecture, release)
+    def get_remote_image_name(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
+        remote = self.get_remote(architecture, release, instance)
         return os.path.basename(remote)
 
-    def read_remote_hash(self, architecture: str, release: str) -> str:
+    def read_remote_hash(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
         if self.remote_hash_structure is None:
             return
 
-        remote_hash = self.get_remote_hash(architecture, release)
-        response = requests.get(remote_hash)
-
-        if response.status_code != 200:
-            raise AtomsUnreachableRemote(remote_hash)
-
-        content = response.text.split("\n")
+        remote_hash = self.get_remote_hash(architecture, release, instance)
+        content = self._get_remote_text(remote_hash, instance).split("\n")
         for line in content:
             if len(line) == 0:
                 continue
@@ -102,12 +121,37 @@ class AtomDistribution:
 
             _hash, _file = items
 
-            if self.get_remote_image_name(architecture, release) in _file.strip():
+            if self.get_remote_image_name(architecture, release, instance) in _file.strip():
                 return _hash.strip()
-            raise AtomsMisconfiguredDistribution(
-                "Hash mismatch or the sum file is not well formatted. Double check that the file name respect its remote.")
 
-        raise ValueError(f"Unknown check_type method: {check_type}")
+        raise AtomsMisconfiguredDistribution(
+            "Hash mismatch or the sum file is not well formatted. Double check that the file name respect its remote.")
+
+    def resolve(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> dict:
+        """
+        Resolve everything needed to download the image for the given
+        architecture and release, and record it in the remote catalog.
+        """
+        remote = self.get_remote(architecture, release, instance)
+        info = {
+            "build": os.path.basename(os.path.dirname(remote)),
+            "remote": remote,
+            "remoteHash": self.get_remote_hash(architecture, release, instance),
+            "hash": self.read_remote_hash(architecture, release, instance),
+            "hashType": self.remote_hash_type,
+            "imageName": self.get_image_name(architecture, release, instance),
+        }
+        self._get_catalog(instance).set_build(
+            self.distribution_id, release, architecture, info)
+        return info
+
+    def get_cached_resolution(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> dict:
+        """
+        Returns the last resolution recorded in the remote catalog without
+        any remote call, None if it was never resolved.
+        """
+        return self._get_catalog(instance).get_build(
+            self.distribution_id, release, architecture)
 
     def is_container_image(self, image: str) -> bool:
         return self.container_image_name in image
@@ -115,7 +159,7 @@ class AtomDistribution:
     def is_image(self, image: str) -> bool:
         return self.distribution_id in image.name.lower()
 
-    def post_unpack(self, chroot: str):
+    def post_unpack(self, chroot: str, instance: "AtomsInstance" = None):
         pass
 
     def set_motd(self, chroot: str):
@@ -126,7 +170,7 @@ class AtomDistribution:
                 f.write(self.motd
                         + "\n\nTo disable this message, remove 'cat /etc/motd' from /etc/profile.\n")
 
-    def _download_resource(self, url: str):
+    def _download_resource(self, url: str, instance: "AtomsInstance" = None):
         temp_path = tempfile.gettempdir()
         temp_resource_folder = os.path.join(temp_path, str(uuid.uuid4()))
         temp_resource_file = os.path.join(
@@ -134,15 +178,13 @@ class AtomDistribution:
 
         os.makedirs(temp_resource_folder)
 
-        with open(temp_resource_file, "wb") as f:
-            response = requests.get(url, stream=True)
+        with open(temp_resource_file, "wb") as f, \
+                self._get_http_client(instance).get(url, stream=True) as response:
             if response.status_code != 200:
                 raise AtomsUnreachableRemote(url)
 
-            for chunk in response.iter_content(chunk_size=1024):
-                if chunk:
-                    f.write(chunk)
-                    f.flush()
+            for chunk in ChunkReader(response):
+                f.write(chunk)
 
         return temp_resource_file
 
@@ -157,13 +199,12 @@ class AtomDistribution:
             ])
         )
 
-    def _get_remote_dirs(self, url: str) -> list:
-        response = requests.get(url)
+    def _get_remote_text(self, url: str, instance: "AtomsInstance" = None) -> str:
+        return self._get_catalog(instance).get_text(
+            self._get_http_client(instance), url)
 
-        if response.status_code != 200:
-            raise AtomsUnreachableRemote(url)
-
-        html = response.text
+    def _get_remote_dirs(self, url: str, instance: "AtomsInstance" = None) -> list:
+        html = self._get_remote_text(url, instance)
         links = re.findall(r'<a href="(.*?)">(.*?)</a>', html)
 
         if len(links) == 0:
@@ -175,5 +216,32 @@ class AtomDistribution:
         links.sort(reverse=True)
         return links
 
-    def _get_latest_remote_dir(self, url: str) -> str:
-        return self._get_remote_dirs(url)[0]
+    def _get_latest_remote_dir(self, url: str, instance: "AtomsInstance" = None) -> str:
+        return self._get_remote_dirs(url, instance)[0]
+
+    def _get_latest_remote_build(
+        self, url: str, architecture: str, release: str, instance: "AtomsInstance" = None
+    ) -> str:
+        """
+        Returns the latest build directory listed in url for the given
+        architecture and release, the result is cached in remote_builds.
+        """
+        return self.remote_builds.get_or_set(
+            (self.distribution_id, release, architecture),
+            lambda: self._get_latest_remote_dir(url, instance)
+        )
+
+    def invalidate_remote_builds(self, architecture: str = None, release: str = None):
+        """
+        Forget the cached remote builds of this distribution, or only the
+        one for the given architecture and release.
+        """
+        if architecture is not None and release is not None:
+            self.remote_builds.invalidate(
+                (self.distribution_id, release, architecture))
+            return
+
+        for _release in self.releases:
+            for _architecture in self.architectures.values():
+                self.remote_builds.invalidate(
+                    (self.distribution_id, _release, _architecture))
@@ -1,8 +1,16 @@
-import os, sys
-
-for filename in os.listdir(os.path.dirname(__file__)):
-    if filename.endswith('.py'):
-        name = filename[:-3]
-        if name != '__init__':
-            exec('from .%s import *' % name)
-            
+from atoms_core.entities.distributions.registry import AtomsDistributionRegistry
+
+
+# distribution classes are imported on first access, see the registry
+__classes = {
+    info[1]: info[0] for info in list(AtomsDistributionRegistry.builtins.values())
+    + list(AtomsDistributionRegistry.hidden.values())
+}
+
+__all__ = list(__classes)
+
+
+def __getattr__(name: str):
+    if name in __classes:
+        return AtomsDistributionRegistry.get_class(__classes[name], name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
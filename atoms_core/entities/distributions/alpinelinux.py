@@ -28,7 +28,7 @@ Report bugs in the Atoms repository.
 Good luck!
 """)
 
-    def get_remote(self, architecture: str, release: str) -> str:
+    def get_remote(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
         return self.remote_structure.format(
             # only take major and minor version
             '.'.join(release.split('.')[:2]),
@@ -36,7 +36,7 @@ Good luck!
             release
         )
 
-    def get_remote_hash(self, architecture: str, release: str) -> str:
+    def get_remote_hash(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
         return self.remote_hash_structure.format(
             # only take major and minor version
             '.'.join(release.split('.')[:2]),
@@ -44,6 +44,6 @@ Good luck!
             release
         )
 
-    def post_unpack(self, chroot: str):
+    def post_unpack(self, chroot: str, instance: "AtomsInstance" = None):
         # share/fake current user
         self.set_current_user(chroot)
@@ -30,24 +30,26 @@ Report bugs in the Atoms repository.
 Good luck!
 """ if "FLATPAK_ID" in os.environ else None)
 
-    def __get_base_path(self, architecture: str, release: str) -> str:
+    def __get_base_path(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
         base_url = "https://uk.lxd.images.canonical.com/images/archlinux/{release}/{architecture}/default".format(
             release=release, architecture=architecture
         )
-        build = self._get_latest_remote_dir(base_url)
+        build = self._get_latest_remote_build(
+            base_url, architecture, release, instance)
         return "{0}/{1}".format(base_url, build)
 
-    def get_remote(self, architecture: str, release: str) -> str:
-        return "{0}/rootfs.tar.xz".format(self.__get_base_path(architecture, release))
+    def get_remote(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
+        return "{0}/rootfs.tar.xz".format(self.__get_base_path(architecture, release, instance))
 
-    def get_remote_hash(self, architecture: str, release: str) -> str:
-        return "{0}/SHA256SUMS".format(self.__get_base_path(architecture, release))
+    def get_remote_hash(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
+        return "{0}/SHA256SUMS".format(self.__get_base_path(architecture, release, instance))
 
-    def post_unpack(self, chroot: str):
+    def post_unpack(self, chroot: str, instance: "AtomsInstance" = None):
         # workaround Code:FAIL_INIT_ALPM
         if "FLATPAK_ID" in os.environ:
             glibc = self._download_resource(
-                "https://repo.archlinuxcn.org/x86_64/glibc-linux4-2.35-2-x86_64.pkg.tar.zst")
+                "https://repo.archlinuxcn.org/x86_64/glibc-linux4-2.35-2-x86_64.pkg.tar.zst",
+                instance)
             self._extract_resource(glibc, chroot)
             with open(os.path.join(chroot, "etc/pacman.conf"), "r") as f:
                 lines = f.readlines()
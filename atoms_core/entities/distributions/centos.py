@@ -20,20 +20,21 @@ class Centos(AtomDistribution, RpmDistribution, CommonDistribution):
             motd=self._rpm_motd("Centos")
         )
 
-    def __get_base_path(self, architecture: str, release: str) -> str:
+    def __get_base_path(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
         base_url = "https://uk.lxd.images.canonical.com/images/centos/{release}/{architecture}/default".format(
             release=release, architecture=architecture
         )
-        build = self._get_latest_remote_dir(base_url)
+        build = self._get_latest_remote_build(
+            base_url, architecture, release, instance)
         return "{0}/{1}".format(base_url, build)
 
-    def get_remote(self, architecture: str, release: str) -> str:
-        return "{0}/rootfs.tar.xz".format(self.__get_base_path(architecture, release))
+    def get_remote(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
+        return "{0}/rootfs.tar.xz".format(self.__get_base_path(architecture, release, instance))
 
-    def get_remote_hash(self, architecture: str, release: str) -> str:
-        return "{0}/SHA256SUMS".format(self.__get_base_path(architecture, release))
+    def get_remote_hash(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
+        return "{0}/SHA256SUMS".format(self.__get_base_path(architecture, release, instance))
 
-    def post_unpack(self, chroot: str):
+    def post_unpack(self, chroot: str, instance: "AtomsInstance" = None):
         # workaround Code:RPM_UNPK_NO_PERM
         self.set_macros(chroot)
 
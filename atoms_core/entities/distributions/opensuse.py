@@ -20,21 +20,21 @@ class OpenSuse(AtomDistribution, RpmDistribution, CommonDistribution):
             motd=self._rpm_motd("OpenSUSE"),
         )
 
-    def get_remote(self, architecture: str, release: str) -> str:
+    def get_remote(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
         return self.remote_structure.format(
             release,
             architecture,
             release.replace("_", "-")
         )
 
-    def get_remote_hash(self, architecture: str, release: str) -> str:
+    def get_remote_hash(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
         return self.remote_hash_structure.format(
             release,
             architecture,
             release.replace("_", "-")
         )
 
-    def post_unpack(self, chroot: str):
+    def post_unpack(self, chroot: str, instance: "AtomsInstance" = None):
         # workaround Code:RPM_UNPK_NO_PERM
         self.set_macros(chroot)
 
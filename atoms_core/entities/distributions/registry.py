@@ -0,0 +1,143 @@
+import logging
+import threading
+import importlib
+
+
+logger = logging.getLogger("atoms.distributions.registry")
+
+ENTRY_POINT_GROUP = "atoms_core.distributions"
+
+
+class AtomsDistributionRegistry:
+    """
+    Maps distribution ids to their class, imported on first use, and
+    keeps a single instance of each distribution. Third-party
+    distributions are registered through the "atoms_core.distributions"
+    entry point group, the entry point name being the distribution id and
+    its object the AtomDistribution subclass, e.g.:
+
+        [options.entry_points]
+        atoms_core.distributions =
+            mydistro = mypackage.mydistro:MyDistro
+    """
+
+    # distribution id: (module, class, container image name, experimental)
+    # listed in the order clients show them
+    builtins = {
+        "alpinelinux": ("alpinelinux", "AlpineLinux", "alpine", False),
+        "ubuntu": ("ubuntu", "Ubuntu", "ubuntu", False),
+        "fedora": ("fedora", "Fedora", "fedora", False),
+        "almalinux": ("almalinux", "AlmaLinux", "almalinux", False),
+        "rockylinux": ("rockylinux", "RockyLinux", "rockylinux", False),
+        "centos": ("centos", "Centos", "centos", False),
+        "debian": ("debian", "Debian", "debian", False),
+        "vanilla": ("vanilla", "VanillaOS", "orchid", False),
+        "opensuse": ("opensuse", "OpenSuse", "opensuse", False),
+        "gentoo": ("gentoo", "Gentoo", "gentoo", False),
+        "archlinux": ("archlinux", "ArchLinux", "archlinux", True),  # pacman broken
+        "voidlinux": ("voidlinux", "VoidLinux", "voidlinux", True),  # libc.so.6 not found
+    }
+
+    # not listed, only returned when explicitly requested
+    hidden = {
+        "host": ("host", "Host"),
+        "unknown": ("unknown", "Unknown"),
+    }
+
+    __instances = {}
+    __external = None
+    __lock = threading.RLock()
+
+    @staticmethod
+    def get_class(module: str, class_name: str) -> type:
+        module = importlib.import_module(
+            f"atoms_core.entities.distributions.{module}")
+        return getattr(module, class_name)
+
+    @classmethod
+    def __get_external(cls) -> dict:
+        if cls.__external is not None:
+            return cls.__external
+
+        # importlib.metadata is slow to import, only needed from here
+        from importlib.metadata import entry_points
+
+        external = {}
+        try:
+            eps = entry_points(group=ENTRY_POINT_GROUP)
+        except TypeError:  # python < 3.10
+            eps = entry_points().get(ENTRY_POINT_GROUP, [])
+
+        for ep in eps:
+            if ep.name in cls.builtins or ep.name in cls.hidden:
+                logger.warning(f"Ignoring {ep.value}, {ep.name} is built-in")
+                continue
+            external[ep.name] = ep
+
+        cls.__external = external
+        return external
+
+    @classmethod
+    def __create(cls, distribution_id: str) -> "AtomDistribution":
+        if distribution_id in cls.builtins:
+            module, class_name, _, _ = cls.builtins[distribution_id]
+            return cls.get_class(module, class_name)()
+        if distribution_id in cls.hidden:
+            return cls.get_class(*cls.hidden[distribution_id])()
+
+        ep = cls.__get_external().get(distribution_id)
+        if ep is None:
+            return None
+
+        try:
+            return ep.load()()
+        except Exception:
+            logger.exception(f"Failed to load the {distribution_id} distribution")
+            return None
+
+    @classmethod
+    def get(cls, distribution_id: str) -> "AtomDistribution":
+        """
+        Returns the shared instance of the distribution, the Unknown one
+        if not found.
+        """
+        with cls.__lock:
+            distribution = cls.__instances.get(distribution_id)
+            if distribution is None:
+                distribution = cls.__create(distribution_id)
+                if distribution is None:
+                    return cls.get("unknown")
+                cls.__instances[distribution_id] = distribution
+            return distribution
+
+    @classmethod
+    def get_ids(cls, experimental: bool = False) -> list:
+        ids = [
+            distribution_id for distribution_id, info in cls.builtins.items()
+            if experimental or not info[3]
+        ]
+        return ids + list(cls.__get_external())
+
+    @classmethod
+    def get_all(cls, experimental: bool = False) -> list:
+        return [cls.get(distribution_id) for distribution_id in cls.get_ids(experimental)]
+
+    @classmethod
+    def get_by_container_image(
+        cls, image: str, experimental: bool = False
+    ) -> "AtomDistribution":
+        """
+        Returns the distribution whose container image name is part of
+        image. Built-in distributions are matched without being imported.
+        """
+        for distribution_id, info in cls.builtins.items():
+            if (experimental or not info[3]) and info[2] in image:
+                return cls.get(distribution_id)
+
+        for distribution_id in cls.__get_external():
+            distribution = cls.get(distribution_id)
+            if distribution.distribution_id != "unknown" \
+                    and distribution.is_container_image(image):
+                return distribution
+
+        return cls.get("unknown")
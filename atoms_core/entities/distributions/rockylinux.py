@@ -20,7 +20,7 @@ class RockyLinux(AtomDistribution, RpmDistribution, CommonDistribution):
             motd=self._rpm_motd("Rocky Linux")
         )
 
-    def post_unpack(self, chroot: str):
+    def post_unpack(self, chroot: str, instance: "AtomsInstance" = None):
         # workaround Code:RPM_UNPK_NO_PERM
         self.set_macros(chroot)
 
@@ -18,17 +18,17 @@ class VanillaOS(AtomDistribution, CommonDistribution):
             default_cmd=["bash", "--login"],
         )
 
-    def __get_base_path(self, architecture: str, release: str) -> str:
+    def __get_base_path(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
         return "https://github.com/Vanilla-OS/pico-image/releases/download/continuous"
 
-    def get_remote(self, architecture: str, release: str) -> str:
+    def get_remote(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
         return "{0}/vanilla-pico.tar.gz".format(
-            self.__get_base_path(architecture, release)
+            self.__get_base_path(architecture, release, instance)
         )
 
-    def get_remote_hash(self, architecture: str, release: str) -> str:
-        return "{0}/SHA256SUMS".format(self.__get_base_path(architecture, release))
+    def get_remote_hash(self, architecture: str, release: str, instance: "AtomsInstance" = None) -> str:
+        return "{0}/SHA256SUMS".format(self.__get_base_path(architecture, release, instance))
 
-    def post_unpack(self, chroot: str):
+    def post_unpack(self, chroot: str, instance: "AtomsInstance" = None):
         # share/fake current user
         self.set_current_user(chroot)
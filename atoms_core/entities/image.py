@@ -15,57 +15,89 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
-import shutil
-import tarfile
+import threading
 
 from atoms_core.exceptions.image import AtomsImageMissingRoot
 from atoms_core.models.image import ImageModel
+from atoms_core.utils.archive import ArchiveUtils
 
 
 class AtomImage(ImageModel):
 
-    def __init__(self, name: str, path: str, root: str = None):
-        super().__init__(name, path, root)
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        root: str = None,
+        digest: str = None,
+        distribution_id: str = None,
+        release: str = None,
+        architecture: str = None,
+        stat: os.stat_result = None,
+    ):
+        super().__init__(
+            name, path, root, digest, distribution_id, release, architecture,
+            stat)
 
-    def unpack(self, destination: str):
+    def unpack(self, destination: str, source: "io.BufferedIOBase" = None):
+        """
+        Extract the image into destination, from source if given (e.g. the
+        image being downloaded) instead of the image file.
+        """
         if self.root is None:
             raise AtomsImageMissingRoot(self.name)
 
         if not os.path.exists(destination):
             os.makedirs(destination)
 
-        with tarfile.open(self.path) as tar:
-            def is_within_directory(directory, target):
-                
-                abs_directory = os.path.abspath(directory)
-                abs_target = os.path.abspath(target)
-            
-                prefix = os.path.commonprefix([abs_directory, abs_target])
-                
-                return prefix == abs_directory
-            
-            def safe_extract(tar, path=".", members=None, *, numeric_owner=False):
-            
-                for member in tar.getmembers():
-                    member_path = os.path.join(path, member.name)
-                    if not is_within_directory(path, member_path):
-                        raise Exception("Attempted Path Traversal in Tar File")
-            
-                tar.extractall(path, members, numeric_owner=numeric_owner) 
-                
-            
-            safe_extract(tar, destination)
+        # the root directory of the image is stripped while extracting, so
+        # files land in their final location in a single pass
+        ArchiveUtils.extract(
+            source or self.path, destination, strip=self.root or None)
 
-        if self.root == "":
-            return
+    def unpack_streaming(self, destination: str, download: callable):
+        """
+        Extract the image into destination while download(stream) writes
+        the archive to stream. If either fails the error is raised and
+        destination is left as is, the caller must remove it.
+        """
+        read_fd, write_fd = os.pipe()
+        reader = os.fdopen(read_fd, "rb")
+        writer = os.fdopen(write_fd, "wb")
+        errors = []
 
-        root = os.path.join(destination, self.root)
+        def extract():
+            try:
+                self.unpack(destination, source=reader)
+                # the tar end of archive can be followed by padding,
+                # the download must not block writing it
+                while reader.read(ArchiveUtils.buffer_size):
+                    pass
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                reader.close()
 
-        for file in os.listdir(root):
-            _file = os.path.join(root, file)
-            shutil.move(_file, destination)
+        extractor = threading.Thread(target=extract, daemon=True)
+        extractor.start()
 
-        os.rmdir(root)
+        try:
+            download(writer)
+        except BaseException:
+            # a failed extraction breaks the pipe and so fails the
+            # download too, its own error is the meaningful one
+            if errors:
+                raise errors[0]
+            raise
+        finally:
+            try:
+                writer.close()
+            except BrokenPipeError:
+                pass
+            extractor.join()
+
+        if errors:
+            raise errors[0]
 
     def destroy(self):
         os.remove(self.path)
@@ -0,0 +1,344 @@
+# image_store.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import fcntl
+import orjson
+import logging
+import datetime
+import threading
+import contextlib
+
+from atoms_core.models.result import ResultModel
+from atoms_core.utils.rootfs import RootfsCache
+
+
+logger = logging.getLogger("atoms.image_store")
+
+
+class AtomsImageStore:
+    """
+    Index of the downloaded images, stored in the images path as
+    .index.json. It keeps, for each image, its digest, size and origin
+    (distribution, release and architecture) and which atoms were created
+    from it, so identical images are downloaded once and unused ones can
+    be collected without scanning the images path on every call.
+
+    The index is shared by the jobs and processes using the images path,
+    it is reloaded when changed on disk and every change is made on a
+    fresh copy while holding the index lock, see __update.
+    """
+    __lock = threading.RLock()
+
+    def __init__(self, config: "AtomsConfig"):
+        self.__config = config
+        self.path = os.path.join(config.atoms_images, ".index.json")
+        self.__data = None
+        self.__signature = None
+        self.__updating = False
+
+    @property
+    def __entries(self) -> dict:
+        if self.__data is None or self.__signature != self.__get_signature():
+            self.__data = self.__load()
+            self.__sync()
+        return self.__data
+
+    def __get_signature(self) -> tuple:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @contextlib.contextmanager
+    def __update(self):
+        """
+        Reload the index from disk, yield it to be changed and save it, all
+        while holding the lock, so changes made meanwhile by other stores
+        are never overwritten. Nested updates share the outer one.
+        """
+        with self.__lock:
+            if self.__updating:
+                yield self.__data
+                return
+
+            with open(f"{self.path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self.__updating = True
+                try:
+                    self.__data = self.__load()
+                    self.__sync()
+                    yield self.__data
+                    self.__save()
+                finally:
+                    self.__updating = False
+
+    def __load(self) -> dict:
+        data = {"images": {}, "refs": {}}
+        self.__signature = self.__get_signature()
+        if self.__signature is None:
+            return data
+
+        try:
+            with open(self.path, "rb") as f:
+                data.update(orjson.loads(f.read()))
+        except (OSError, orjson.JSONDecodeError):
+            logger.warning(f"Discarding unreadable image index: {self.path}")
+
+        return data
+
+    def __save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(orjson.dumps(self.__data))
+        os.replace(temp_path, self.path)
+        self.__signature = self.__get_signature()
+
+    def __sync(self):
+        """
+        Track images added or removed outside of the store, the changes
+        are saved by the next update. Only names are compared, the mtime
+        of the images path cannot be used since the index itself lives
+        there.
+        """
+        images_path = self.__config.atoms_images
+        images = self.__data["images"]
+        names = set(
+            name for name in os.listdir(images_path)
+            if not name.startswith(".")
+            and not name.endswith((".part", ".part.json"))
+        )
+        if names == images.keys():
+            return
+
+        for name in list(images):
+            if name not in names:
+                del images[name]
+
+        now = datetime.datetime.now().isoformat()
+        for name in names:
+            if name not in images:
+                images[name] = self.__new_entry(
+                    os.path.getsize(os.path.join(images_path, name)), now)
+
+    @staticmethod
+    def __new_entry(size: int, date: str, digest: str = None) -> dict:
+        return {
+            "digest": digest,
+            "size": size,
+            "distributionId": None,
+            "release": None,
+            "architecture": None,
+            "added": date,
+            "lastUsed": date,
+        }
+
+    def get_path(self, name: str) -> str:
+        return os.path.join(self.__config.atoms_images, name)
+
+    def get(self, name: str) -> dict:
+        with self.__lock:
+            return self.__entries["images"].get(name)
+
+    def find(self, digest: str) -> str:
+        """Returns the name of a stored image with the given digest."""
+        with self.__lock:
+            for name, entry in self.__entries["images"].items():
+                if entry["digest"] == digest \
+                        and os.path.exists(self.get_path(name)):
+                    return name
+
+    def add(
+        self, image: "AtomImage", distribution_id: str, release: str,
+        architecture: str
+    ) -> str:
+        """
+        Track a downloaded image, returns the name of the image to use:
+        if an image with the same digest is already stored, the new one is
+        removed in favour of it.
+        """
+        digest = image.digest
+
+        with self.__update() as data:
+            existing = self.find(digest)
+            if existing is not None and existing != image.name:
+                logger.info(f"{image.name} is a duplicate of {existing}")
+                os.remove(image.path)
+                data["images"].pop(image.name, None)
+                self.touch(existing)
+                return existing
+
+            now = datetime.datetime.now().isoformat()
+            entry = data["images"].get(image.name)
+            if entry is None:
+                entry = self.__new_entry(image.size, now)
+                data["images"][image.name] = entry
+
+            entry.update({
+                "digest": digest,
+                "distributionId": distribution_id,
+                "release": release,
+                "architecture": architecture,
+                "lastUsed": now,
+            })
+
+        return image.name
+
+    def touch(self, name: str):
+        with self.__update() as data:
+            entry = data["images"].get(name)
+            if entry is not None:
+                entry["lastUsed"] = datetime.datetime.now().isoformat()
+
+    def add_ref(self, atom_id: str, name: str):
+        """Record that the atom was created from the image."""
+        with self.__update() as data:
+            data["refs"][atom_id] = name
+
+    def remove_ref(self, atom_id: str):
+        with self.__update() as data:
+            data["refs"].pop(atom_id, None)
+
+    def get_refs(self, name: str) -> list:
+        with self.__lock:
+            return [
+                atom_id for atom_id, image in self.__entries["refs"].items()
+                if image == name
+            ]
+
+    def get_superseded(self) -> list:
+        """
+        Returns the images for which a newer image of the same
+        distribution, release and architecture was downloaded.
+        """
+        with self.__lock:
+            groups = {}
+            for name, entry in self.__entries["images"].items():
+                if entry["distributionId"] is None:
+                    continue
+                key = (entry["distributionId"], entry["release"],
+                       entry["architecture"])
+                groups.setdefault(key, []).append((entry["added"], name))
+
+        superseded = []
+        for images in groups.values():
+            images.sort()
+            superseded += [name for _, name in images[:-1]]
+        return superseded
+
+    def get_collectable(self, max_size: int = None, max_age: int = None) -> list:
+        """
+        Returns the unreferenced images which are superseded, unused for
+        more than max_age days or, from the least recently used, needed to
+        bring the store under max_size bytes. Defaults to the configured
+        images.maxSize and images.maxAge.
+        """
+        if max_size is None:
+            max_size = self.__config.images_max_size
+        if max_age is None:
+            max_age = self.__config.images_max_age
+
+        with self.__lock:
+            images = dict(self.__entries["images"])
+            referenced = set(self.__entries["refs"].values())
+
+        superseded = self.get_superseded()
+        collectable = []
+        unreferenced = sorted(
+            (entry["lastUsed"], name) for name, entry in images.items()
+            if name not in referenced
+        )
+
+        if max_age is not None:
+            threshold = (datetime.datetime.now()
+                         - datetime.timedelta(days=max_age)).isoformat()
+        for last_used, name in unreferenced:
+            if name in superseded \
+                    or (max_age is not None and last_used < threshold):
+                collectable.append(name)
+
+        if max_size is not None:
+            size = sum(
+                entry["size"] for name, entry in images.items()
+                if name not in collectable
+            )
+            for _, name in unreferenced:
+                if size <= max_size:
+                    break
+                if name not in collectable:
+                    collectable.append(name)
+                    size -= images[name]["size"]
+
+        return collectable
+
+    @property
+    def size(self) -> int:
+        with self.__lock:
+            return sum(
+                entry["size"] for entry in self.__entries["images"].values())
+
+    @property
+    def reclaimable(self) -> int:
+        """Bytes freed by collect, computed from the index only."""
+        with self.__lock:
+            images = self.__entries["images"]
+            return sum(images[name]["size"] for name in self.get_collectable())
+
+    def collect(self, dry_run: bool = False) -> ResultModel:
+        """
+        Remove the collectable images and the cached rootfs trees which
+        are neither used by a layered atom nor from a stored image.
+        """
+        rootfs_cache = RootfsCache(self.__config)
+
+        # a dry run changes nothing, so it does not need a fresh copy
+        with self.__lock:
+            update = contextlib.nullcontext(self.__entries) if dry_run \
+                else self.__update()
+            with update as data:
+                images = data["images"]
+                removed_images = self.get_collectable()
+                reclaimed = sum(images[name]["size"] for name in removed_images)
+
+                kept_digests = set(
+                    entry["digest"] for name, entry in images.items()
+                    if name not in removed_images
+                )
+                kept_digests.update(rootfs_cache.get_layers())
+                removed_rootfs = [
+                    digest for digest in rootfs_cache.list()
+                    if digest not in kept_digests
+                ]
+
+                if not dry_run:
+                    for name in removed_images:
+                        logger.info(f"Removing image {name}")
+                        try:
+                            os.remove(self.get_path(name))
+                        except FileNotFoundError:
+                            pass
+                        del images[name]
+
+                    for digest in removed_rootfs:
+                        logger.info(f"Removing cached rootfs {digest}")
+                        rootfs_cache.remove(digest)
+
+        return ResultModel(True, {
+            "images": removed_images,
+            "rootfs": removed_rootfs,
+            "reclaimed": reclaimed,
+        })
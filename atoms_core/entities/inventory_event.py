@@ -0,0 +1,26 @@
+# inventory_event.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from enum import Enum
+
+
+class InventoryEvent(Enum):
+    ATOM_ADDED = 0
+    ATOM_REMOVED = 1
+    ATOM_CHANGED = 2
+    IMAGE_ADDED = 3
+    IMAGE_REMOVED = 4
+    IMAGE_CHANGED = 5
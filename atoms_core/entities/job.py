@@ -0,0 +1,169 @@
+# job.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import threading
+
+from atoms_core.entities.job_stage import JobStage
+from atoms_core.exceptions.job import AtomsJobCancelled
+from atoms_core.exceptions.download import AtomsDownloadCancelled
+
+
+logger = logging.getLogger("atoms.job")
+
+# share of the overall progress reached when a stage starts
+STAGE_PROGRESS = {
+    JobStage.QUEUED: 0.0,
+    JobStage.DOWNLOADING: 0.0,
+    JobStage.CONFIGURING: 0.5,
+    JobStage.CREATING_CONTAINER: 0.0,
+    JobStage.UNPACKING: 0.55,
+    JobStage.FINALIZING: 0.9,
+    JobStage.DONE: 1.0,
+    JobStage.FAILED: 1.0,
+    JobStage.CANCELLED: 1.0,
+}
+
+
+class AtomsJob:
+    """
+    Handle of an atom creation running on the backend job pool, see
+    AtomsBackend.create_atom.
+
+    Each stage change is notified to stage_fn(job, stage) and download
+    updates to progress_fn(job), both on the main thread. The job can be
+    cancelled at any time, the worker stops at the next chunk or stage
+    and removes the half-created atom; containers being created by
+    distrobox are left to finish.
+    """
+
+    def __init__(
+        self,
+        instance: "AtomsInstance",
+        name: str,
+        stage_fn: callable = None,
+        progress_fn: callable = None
+    ):
+        self.__instance = instance
+        self.__name = name
+        self.__stage_fn = stage_fn
+        self.__progress_fn = progress_fn
+        self.__stage = JobStage.QUEUED
+        self.__download_progress = None
+        self.__error = None
+        self.__result = None
+        self.__cancel_event = threading.Event()
+        self.__done_event = threading.Event()
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def stage(self) -> JobStage:
+        return self.__stage
+
+    @property
+    def download_progress(self) -> "ProgressModel":
+        return self.__download_progress
+
+    @property
+    def progress(self) -> float:
+        """Overall progress, from 0.0 to 1.0."""
+        progress = STAGE_PROGRESS[self.__stage]
+        if self.__stage == JobStage.DOWNLOADING \
+                and self.__download_progress is not None:
+            fraction = self.__download_progress.fraction or 0.0
+            progress += fraction * STAGE_PROGRESS[JobStage.CONFIGURING]
+        return progress
+
+    @property
+    def error(self) -> str:
+        return self.__error
+
+    @property
+    def result(self) -> "Atom":
+        return self.__result
+
+    @property
+    def cancel_event(self) -> threading.Event:
+        return self.__cancel_event
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.__cancel_event.is_set()
+
+    @property
+    def is_done(self) -> bool:
+        return self.__done_event.is_set()
+
+    def cancel(self):
+        self.__cancel_event.set()
+
+    def wait(self, timeout: float = None) -> "Atom":
+        """
+        Wait for the job to end, returns the created atom or None if it
+        failed, was cancelled or the timeout expired.
+        """
+        self.__done_event.wait(timeout)
+        return self.__result
+
+    def set_stage(self, stage: JobStage):
+        """
+        Called by the worker when entering a stage, raises
+        AtomsJobCancelled if the job was cancelled meanwhile.
+        """
+        if self.is_cancelled and not stage.is_final:
+            raise AtomsJobCancelled(self.__name)
+
+        self.__stage = stage
+        if self.__stage_fn:
+            self.__instance.client_bridge.exec_on_main(
+                self.__stage_fn, self, stage)
+
+    def set_error(self, error: str):
+        self.__error = error
+
+    def update_download(self, progress: "ProgressModel"):
+        """Progress sink for the image download."""
+        self.__download_progress = progress
+        if self.__progress_fn:
+            self.__instance.client_bridge.exec_on_main(
+                self.__progress_fn, self)
+
+    def run(self, target: callable, *args, **kwargs):
+        """
+        Run target(*args, job=self, **kwargs) on the calling thread, it is
+        expected to return the atom or None on failure, reporting the
+        error with set_error.
+        """
+        try:
+            if self.is_cancelled:
+                raise AtomsJobCancelled(self.__name)
+
+            self.__result = target(*args, job=self, **kwargs)
+            if self.__result is None:
+                self.set_stage(JobStage.FAILED)
+            else:
+                self.set_stage(JobStage.DONE)
+        except (AtomsJobCancelled, AtomsDownloadCancelled):
+            self.set_stage(JobStage.CANCELLED)
+        except Exception as e:
+            logger.exception(f"Job {self.__name} failed")
+            self.__error = str(e)
+            self.set_stage(JobStage.FAILED)
+        finally:
+            self.__done_event.set()
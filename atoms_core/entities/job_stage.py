@@ -0,0 +1,33 @@
+# job_stage.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from enum import Enum
+
+
+class JobStage(Enum):
+    QUEUED = 0
+    DOWNLOADING = 1
+    CONFIGURING = 2
+    UNPACKING = 3
+    CREATING_CONTAINER = 4
+    FINALIZING = 5
+    DONE = 6
+    FAILED = 7
+    CANCELLED = 8
+
+    @property
+    def is_final(self) -> bool:
+        return self in [JobStage.DONE, JobStage.FAILED, JobStage.CANCELLED]
@@ -0,0 +1,129 @@
+# registry.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import orjson
+import logging
+
+from atoms_core.entities.atom import Atom
+from atoms_core.exceptions.atom import AtomsConfigFileNotFound
+
+
+logger = logging.getLogger("atoms.registry")
+
+
+class AtomsRegistry:
+    """
+    Index of the chroot atoms, stored in the atoms path as .registry.json.
+    It keeps the configuration of each atom along with the mtime of its
+    directory and atom.json, so only the atoms changed since the last
+    load have their configuration parsed again.
+    """
+
+    def __init__(self, config: "AtomsConfig"):
+        self.__config = config
+        self.path = os.path.join(config.atoms_path, ".registry.json")
+
+    def __load(self) -> dict:
+        data = {"atoms": {}}
+        if not os.path.exists(self.path):
+            return data
+
+        try:
+            with open(self.path, "rb") as f:
+                data.update(orjson.loads(f.read()))
+        except (OSError, orjson.JSONDecodeError):
+            logger.warning(f"Discarding unreadable registry: {self.path}")
+
+        return data
+
+    def __save(self, data: dict):
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(orjson.dumps(data))
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            # the registry is just a cache, atoms can still be listed
+            logger.warning(f"Cannot write the registry: {e}")
+
+    @staticmethod
+    def __read_config(path: str) -> dict:
+        try:
+            with open(path, "rb") as f:
+                return orjson.loads(f.read())
+        except FileNotFoundError:
+            raise AtomsConfigFileNotFound(path)
+
+    def get_atoms(self, instance: "AtomsInstance") -> dict:
+        """
+        Returns the chroot atoms, keyed by their relative path.
+        """
+        data = self.__load()
+        entries = data["atoms"]
+        changed = False
+        atoms = {}
+
+        names = [
+            name for name in os.listdir(self.__config.atoms_path)
+            if name.endswith(".atom")
+        ]
+
+        for name in list(entries):
+            if name not in names:
+                del entries[name]
+                changed = True
+
+        for name in names:
+            atom_path = os.path.join(self.__config.atoms_path, name)
+            config_path = os.path.join(atom_path, "atom.json")
+
+            try:
+                config_stat = os.stat(config_path)
+            except FileNotFoundError:
+                logger.warning(
+                    "Atom configuration file not found with path: {}".format(name))
+                if entries.pop(name, None) is not None:
+                    changed = True
+                continue
+
+            signature = [
+                os.stat(atom_path).st_mtime_ns,
+                config_stat.st_mtime_ns,
+                config_stat.st_size,
+            ]
+            entry = entries.get(name)
+
+            if entry is None or entry["signature"] != signature:
+                try:
+                    atom_data = self.__read_config(config_path)
+                except AtomsConfigFileNotFound:
+                    logger.warning(
+                        "Atom configuration file not found with path: {}".format(name))
+                    continue
+
+                entry = {"signature": signature, "data": atom_data}
+                entries[name] = entry
+                changed = True
+
+            # from_dict fills the missing options in place, the cached data
+            # is copied to keep it as read from atom.json
+            atoms[name] = Atom.from_dict(instance, dict(entry["data"]))
+
+        if changed:
+            self.__save(data)
+
+        return atoms
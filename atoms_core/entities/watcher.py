@@ -0,0 +1,257 @@
+# watcher.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import logging
+import threading
+
+from atoms_core.entities.inventory_event import InventoryEvent
+from atoms_core.wrappers.inotify import (
+    InotifyWrapper, IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE,
+    IN_DELETE, IN_Q_OVERFLOW, IN_IGNORED, IN_ONLYDIR, IN_ISDIR,
+)
+
+
+logger = logging.getLogger("atoms.watcher")
+
+ATOMS_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR
+ATOM_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_ONLYDIR
+IMAGES_MASK = IN_CLOSE_WRITE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO \
+    | IN_ONLYDIR
+
+
+class AtomsInventoryWatcher:
+    """
+    Watch the atoms and images paths and call event_fn(event, name) from
+    a background thread when an atom or an image is added, removed or
+    changed. Atoms count as added once their atom.json is written. It
+    relies on inotify, falling back to polling every interval seconds
+    where it is not available (or if ATOMS_POLL_INVENTORY is set).
+    """
+
+    def __init__(
+        self, config: "AtomsConfig", event_fn: callable, interval: float = 2.0
+    ):
+        self.__config = config
+        self.__event_fn = event_fn
+        self.interval = interval
+        self.__stop = threading.Event()
+        self.__thread = None
+        self.__atoms = {}
+        self.__images = {}
+
+    @property
+    def is_running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+
+        self.__stop.clear()
+        self.__atoms = self.__scan_atoms()
+        self.__images = self.__scan_images()
+
+        inotify = InotifyWrapper()
+        if not inotify.is_supported or "ATOMS_POLL_INVENTORY" in os.environ:
+            inotify = None
+        else:
+            try:
+                inotify.open()
+            except OSError as e:
+                logger.info(f"inotify not available, polling instead: {e}")
+                inotify = None
+
+        if inotify is None:
+            target, args = self.__poll, ()
+        else:
+            target, args = self.__watch, (inotify,)
+
+        self.__thread = threading.Thread(target=target, args=args, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        if self.is_running:
+            self.__thread.join()
+        self.__thread = None
+
+    @staticmethod
+    def __signature(path: str) -> tuple:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def __scan_atoms(self) -> dict:
+        atoms = {}
+        for name in os.listdir(self.__config.atoms_path):
+            if not name.endswith(".atom"):
+                continue
+            signature = self.__signature(
+                os.path.join(self.__config.atoms_path, name, "atom.json"))
+            if signature is not None:
+                atoms[name] = signature
+        return atoms
+
+    @staticmethod
+    def __is_image(name: str) -> bool:
+        return not name.startswith(".") \
+            and not name.endswith((".part", ".part.json"))
+
+    def __scan_images(self) -> dict:
+        images = {}
+        for name in os.listdir(self.__config.atoms_images):
+            if not self.__is_image(name):
+                continue
+            signature = self.__signature(
+                os.path.join(self.__config.atoms_images, name))
+            if signature is not None:
+                images[name] = signature
+        return images
+
+    def __emit(self, event: InventoryEvent, name: str):
+        try:
+            self.__event_fn(event, name)
+        except Exception:
+            logger.exception(f"Failed to handle {event} for {name}")
+
+    def __diff(self, known: dict, current: dict, events: tuple):
+        added, removed, changed = events
+        for name in known.keys() - current.keys():
+            self.__emit(removed, name)
+        for name, signature in current.items():
+            if name not in known:
+                self.__emit(added, name)
+            elif known[name] != signature:
+                self.__emit(changed, name)
+
+    def __rescan(self):
+        atoms, images = self.__scan_atoms(), self.__scan_images()
+        self.__diff(self.__atoms, atoms, (
+            InventoryEvent.ATOM_ADDED, InventoryEvent.ATOM_REMOVED,
+            InventoryEvent.ATOM_CHANGED))
+        self.__diff(self.__images, images, (
+            InventoryEvent.IMAGE_ADDED, InventoryEvent.IMAGE_REMOVED,
+            InventoryEvent.IMAGE_CHANGED))
+        self.__atoms, self.__images = atoms, images
+
+    def __poll(self):
+        while not self.__stop.wait(self.interval):
+            try:
+                self.__rescan()
+            except OSError as e:
+                logger.warning(f"Failed to scan the inventory: {e}")
+
+    def __update_atom(self, name: str):
+        path = os.path.join(self.__config.atoms_path, name, "atom.json")
+        signature = self.__signature(path)
+        if signature is None:
+            return
+
+        if name not in self.__atoms:
+            event = InventoryEvent.ATOM_ADDED
+        elif self.__atoms[name] != signature:
+            event = InventoryEvent.ATOM_CHANGED
+        else:
+            return
+
+        self.__atoms[name] = signature
+        self.__emit(event, name)
+
+    def __remove_atom(self, name: str):
+        if self.__atoms.pop(name, None) is not None:
+            self.__emit(InventoryEvent.ATOM_REMOVED, name)
+
+    def __update_image(self, name: str):
+        signature = self.__signature(
+            os.path.join(self.__config.atoms_images, name))
+        if signature is None:
+            return
+
+        event = InventoryEvent.IMAGE_ADDED \
+            if name not in self.__images else InventoryEvent.IMAGE_CHANGED
+        self.__images[name] = signature
+        self.__emit(event, name)
+
+    def __remove_image(self, name: str):
+        if self.__images.pop(name, None) is not None:
+            self.__emit(InventoryEvent.IMAGE_REMOVED, name)
+
+    def __watch(self, inotify: InotifyWrapper):
+        atoms_path = self.__config.atoms_path
+        try:
+            atoms_wd = inotify.add_watch(atoms_path, ATOMS_MASK)
+            images_wd = inotify.add_watch(
+                self.__config.atoms_images, IMAGES_MASK)
+        except OSError as e:
+            logger.info(f"Cannot watch the inventory, polling instead: {e}")
+            inotify.close()
+            self.__poll()
+            return
+
+        atom_wds = {}
+
+        def watch_atom(name: str):
+            try:
+                wd = inotify.add_watch(
+                    os.path.join(atoms_path, name), ATOM_MASK)
+            except OSError:
+                return
+            atom_wds[wd] = name
+
+        for name in os.listdir(atoms_path):
+            if name.endswith(".atom"):
+                watch_atom(name)
+
+        try:
+            while not self.__stop.is_set():
+                for wd, mask, _, name in inotify.read_events(0.5):
+                    if mask & IN_Q_OVERFLOW:
+                        logger.debug("inotify queue overflow, rescanning")
+                        # atoms created meanwhile have no watch yet, an
+                        # already watched path keeps its watch descriptor
+                        for name in os.listdir(atoms_path):
+                            if name.endswith(".atom"):
+                                watch_atom(name)
+                        self.__rescan()
+                    elif mask & IN_IGNORED:
+                        atom_wds.pop(wd, None)
+                    elif wd == atoms_wd:
+                        if not name.endswith(".atom") or not mask & IN_ISDIR:
+                            continue
+                        if mask & (IN_CREATE | IN_MOVED_TO):
+                            watch_atom(name)
+                            self.__update_atom(name)
+                        else:
+                            self.__remove_atom(name)
+                    elif wd in atom_wds:
+                        if name != "atom.json":
+                            continue
+                        if mask & IN_DELETE:
+                            self.__remove_atom(atom_wds[wd])
+                        else:
+                            self.__update_atom(atom_wds[wd])
+                    elif wd == images_wd:
+                        if not self.__is_image(name) or mask & IN_ISDIR:
+                            continue
+                        if mask & (IN_DELETE | IN_MOVED_FROM):
+                            self.__remove_image(name)
+                        else:
+                            self.__update_image(name)
+        finally:
+            inotify.close()
@@ -51,3 +51,13 @@ class AtomsConfigFileNotFound(AtomsException):
 
     def __init__(self, path: str):
         super().__init__("Atom configuration file not found: {}".format(path))
+
+
+class AtomsLayersNotSupported(AtomsException):
+    """
+    Exception raised when a layered atom is requested or started but the
+    layers can not be merged, since fuse-overlayfs is not available.
+    """
+
+    def __init__(self, name: str):
+        super().__init__("Layered atoms need fuse-overlayfs, which is not available: {}".format(name))
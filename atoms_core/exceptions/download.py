@@ -24,3 +24,33 @@ class AtomsHashMissmatchError(AtomsException):
 
     def __init__(self):
         super().__init__("The hash of the downloaded file is not the same as the one in the distribution file.")
+
+
+class AtomsRangeNotSupported(AtomsException):
+    """
+    Exception raised when the remote does not honor a Range request.
+    """
+
+    def __init__(self, url: str):
+        super().__init__("The remote does not support range requests: {}".format(url))
+
+
+class AtomsIncompleteDownload(AtomsException):
+    """
+    Exception raised when the remote closes the stream before the expected
+    amount of bytes was received.
+    """
+
+    def __init__(self, url: str, expected: int, received: int):
+        super().__init__("Incomplete download from {}: expected {} bytes, got {}".format(
+            url, expected, received))
+
+
+class AtomsDownloadCancelled(AtomsException):
+    """
+    Exception raised when a download is cancelled through its cancel
+    event, the partial file is kept so the download can be resumed.
+    """
+
+    def __init__(self, url: str):
+        super().__init__("The download of {} was cancelled.".format(url))
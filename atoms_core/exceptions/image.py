@@ -33,3 +33,23 @@ class AtomsImageMissingRoot(AtomsException):
 
     def __init__(self, image: str):
         super().__init__("Image {} has no root".format(image))
+
+
+class AtomsImageUnsafeMember(AtomsException):
+    """
+    Exception raised when an image contains a member which would be
+    extracted outside of the destination.
+    """
+
+    def __init__(self, member: str):
+        super().__init__("Attempted path traversal in image member: {}".format(member))
+
+
+class AtomsImageUnsupportedCompression(AtomsException):
+    """
+    Exception raised when an image is compressed with an unsupported
+    algorithm or the required decompressor is missing.
+    """
+
+    def __init__(self, compression: str):
+        super().__init__("Unsupported image compression: {}".format(compression))
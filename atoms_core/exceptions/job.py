@@ -0,0 +1,26 @@
+# job.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from atoms_core.exceptions.exception import AtomsException
+
+
+class AtomsJobCancelled(AtomsException):
+    """
+    Exception raised in a job worker when the job has been cancelled.
+    """
+
+    def __init__(self, name: str):
+        super().__init__("The job {} was cancelled.".format(name))
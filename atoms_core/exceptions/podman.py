@@ -24,3 +24,13 @@ class AtomsFailToCreateContainer(AtomsException):
 
     def __init__(self, trace: str):
         super().__init__("Failed to create container: {}".format(trace))
+
+
+class AtomsPodmanApiError(AtomsException):
+    """
+    Exception raised when the Podman API socket cannot be reached or
+    returns an error.
+    """
+
+    def __init__(self, path: str, message: str):
+        super().__init__("Podman API request {} failed: {}".format(path, message))
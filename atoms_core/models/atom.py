@@ -20,7 +20,6 @@ import datetime
 
 from atoms_core.utils.paths import AtomsPathsUtils
 from atoms_core.utils.distribution import AtomsDistributionsUtils
-from atoms_core.entities.distributions.host import Host
 
 
 class AtomModel:
@@ -40,6 +39,7 @@ class AtomModel:
         bind_icons: bool = False,
         bind_fonts: bool = False,
         bind_extra_mounts: list = None,
+        layers: list = None,
     ):
         if update_date is None and (container_id or system_shell):
             update_date = datetime.datetime.now().isoformat()
@@ -59,6 +59,7 @@ class AtomModel:
         self._bind_icons = bind_icons
         self._bind_fonts = bind_fonts
         self._bind_extra_mounts = bind_extra_mounts or []
+        self._layers = layers or []
 
     @property
     def name(self) -> str:
@@ -90,12 +91,41 @@ class AtomModel:
     def fs_path(self) -> str:
         if self.is_distrobox_container or self._system_shell:
             return ""
+        if self.is_layered:
+            return self.upper_path
         return os.path.join(
             AtomsPathsUtils.get_atom_path(
                 self._instance.config, self._relative_path),
             "chroot"
         )
 
+    @property
+    def layers(self) -> list:
+        return self._layers
+
+    @property
+    def is_layered(self) -> bool:
+        return len(self._layers) > 0
+
+    @property
+    def lower_paths(self) -> list:
+        return [
+            os.path.join(self._instance.config.rootfs_cache_path, layer)
+            for layer in self._layers
+        ]
+
+    @property
+    def upper_path(self) -> str:
+        return os.path.join(self.path, "upper")
+
+    @property
+    def work_path(self) -> str:
+        return os.path.join(self.path, "work")
+
+    @property
+    def merged_path(self) -> str:
+        return os.path.join(self.path, "merged")
+
     @property
     def root_path(self) -> str:
         if self.is_distrobox_container or self._system_shell:
@@ -105,10 +135,15 @@ class AtomModel:
     @property
     def distribution(self) -> 'AtomDistribution':
         if self.is_distrobox_container:
-            return AtomsDistributionsUtils.get_distribution_by_container_image(self._container_image)
-        if self._system_shell:
-            return Host()
-        return AtomsDistributionsUtils.get_distribution(self._distribution_id)
+            distribution = AtomsDistributionsUtils.get_distribution_by_container_image(
+                self._container_image)
+        elif self._system_shell:
+            distribution = AtomsDistributionsUtils.get_distribution("host")
+        else:
+            distribution = AtomsDistributionsUtils.get_distribution(
+                self._distribution_id)
+
+        return distribution
 
     @property
     def enter_command(self) -> list:
@@ -155,6 +190,17 @@ class AtomModel:
     def container_image(self) -> str:
         return self._container_image
 
+    @property
+    def container_state(self) -> str:
+        """
+        The state of the distrobox container as known by the container
+        tracker, None if not tracked.
+        """
+        tracker = self._instance.container_tracker
+        if not self.is_distrobox_container or tracker is None:
+            return None
+        return tracker.get_state(self._container_id)
+
     @property
     def bind_themes(self) -> bool:
         return self._bind_themes
@@ -18,6 +18,7 @@ import os
 import datetime
 
 from atoms_core.utils.file import FileUtils
+from atoms_core.utils.hash import HashUtils
 
 
 class ImageModel:
@@ -27,13 +28,35 @@ class ImageModel:
         name: str,
         path: str,
         root: str = None,
+        digest: str = None,
+        distribution_id: str = None,
+        release: str = None,
+        architecture: str = None,
+        stat: os.stat_result = None,
     ):
         self.name = name
         self.path = path
         self.root = root
+        self.distribution_id = distribution_id
+        self.release = release
+        self.architecture = architecture
+        self._digest = digest
+        self._stat = stat
+
+    @property
+    def digest(self) -> str:
+        """
+        Content digest of the image in the <type>-<hash> form, computed
+        from the file when the remote does not provide one.
+        """
+        if self._digest is None:
+            self._digest = "sha256-" + HashUtils.get_hash(self.path, "sha256")
+        return self._digest
 
     @property
     def size(self):
+        if self._stat is not None:
+            return self._stat.st_size
         return os.path.getsize(self.path)
 
     @property
@@ -42,6 +65,8 @@ class ImageModel:
     
     @property
     def date(self):
+        if self._stat is not None:
+            return self._stat.st_mtime
         return os.path.getmtime(self.path)
     
     @property
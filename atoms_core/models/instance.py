@@ -14,12 +14,30 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from atoms_core.wrappers.http_client import HttpClient
+from atoms_core.entities.catalog import AtomsRemoteCatalog
+
 
 class AtomsInstanceModel:
 
-    def __init__(self, config: 'AtomsConfig', client_bridge: 'ClientBridge'):
+    def __init__(
+        self,
+        config: 'AtomsConfig',
+        client_bridge: 'ClientBridge',
+        http_client: 'HttpClient' = None,
+        catalog: 'AtomsRemoteCatalog' = None
+    ):
+        if http_client is None:
+            http_client = HttpClient()
+
+        if catalog is None:
+            catalog = AtomsRemoteCatalog.get_default()
+
         self.__config = config
         self.__client_bridge = client_bridge
+        self.__http_client = http_client
+        self.__catalog = catalog
+        self.__container_tracker = None
 
     @property
     def config(self) -> 'AtomsConfig':
@@ -28,3 +46,19 @@ class AtomsInstanceModel:
     @property
     def client_bridge(self) -> 'ClientBridge':
         return self.__client_bridge
+
+    @property
+    def http_client(self) -> 'HttpClient':
+        return self.__http_client
+
+    @property
+    def catalog(self) -> 'AtomsRemoteCatalog':
+        return self.__catalog
+
+    @property
+    def container_tracker(self) -> 'AtomsContainerStateTracker':
+        return self.__container_tracker
+
+    @container_tracker.setter
+    def container_tracker(self, tracker: 'AtomsContainerStateTracker'):
+        self.__container_tracker = tracker
@@ -0,0 +1,82 @@
+# progress.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+class ProgressModel:
+    """
+    Snapshot of a running transfer, passed to the progress callbacks.
+    total is 0 when the size of the resource is unknown, in that case
+    percent and eta are None.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        downloaded: int = 0,
+        total: int = 0,
+        rate: float = 0.0,
+        finished: bool = False
+    ):
+        self.__name = name
+        self.__downloaded = downloaded
+        self.__total = total
+        self.__rate = rate
+        self.__finished = finished
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def downloaded(self) -> int:
+        return self.__downloaded
+
+    @property
+    def total(self) -> int:
+        return self.__total
+
+    @property
+    def rate(self) -> float:
+        """Bytes per second."""
+        return self.__rate
+
+    @property
+    def finished(self) -> bool:
+        return self.__finished
+
+    @property
+    def fraction(self) -> float:
+        if self.__finished:
+            return 1.0
+        if not self.__total:
+            return None
+        return min(self.__downloaded / self.__total, 1.0)
+
+    @property
+    def percent(self) -> int:
+        fraction = self.fraction
+        if fraction is None:
+            return None
+        return int(fraction * 100)
+
+    @property
+    def eta(self) -> float:
+        """Estimated seconds left."""
+        if self.__finished:
+            return 0.0
+        if not self.__total or not self.__rate:
+            return None
+        return max(self.__total - self.__downloaded, 0) / self.__rate
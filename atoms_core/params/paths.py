@@ -26,3 +26,4 @@ class AtomsPaths:
     atoms = os.path.join(app_data, "atoms")
     images = os.path.join(app_data, "images")
     config_file = os.path.join(app_data, "config.json")
+    catalog_file = os.path.join(app_data, "catalog.json")
@@ -0,0 +1,210 @@
+# archive.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import os
+import logging
+import tarfile
+import threading
+import contextlib
+import subprocess
+from typing import Union
+
+from atoms_core.utils.command import CommandUtils
+from atoms_core.exceptions.image import AtomsImageUnsafeMember, \
+    AtomsImageUnsupportedCompression
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+logger = logging.getLogger("atoms.utils.archive")
+
+
+class ArchiveUtils:
+    """
+    Single pass extraction of (compressed) tar archives. Members are
+    checked against path traversal while the archive streams, so the
+    archive is decompressed only once, without indexing it first.
+    """
+    buffer_size: int = 1024 * 1024
+
+    magics = {
+        b"\x1f\x8b": "gz",
+        b"\xfd7zXZ\x00": "xz",
+        b"BZh": "bz2",
+        b"\x28\xb5\x2f\xfd": "zst",
+    }
+
+    @staticmethod
+    def get_compression(fileobj: "io.BufferedReader") -> str:
+        """
+        Returns the compression of a stream by looking at its magic bytes
+        without consuming them, None for an uncompressed tar.
+        """
+        head = fileobj.peek(6)[:6]
+        for magic, compression in ArchiveUtils.magics.items():
+            if head.startswith(magic):
+                return compression
+        return None
+
+    @staticmethod
+    def extract(
+        source: Union[str, io.BufferedIOBase],
+        destination: str,
+        strip: str = None,
+        numeric_owner: bool = False
+    ):
+        """
+        Extract a tar archive compressed with gz, xz, bz2 or zst (or not
+        compressed at all) into destination.
+
+        :param source: The archive path or a readable binary stream, it is
+               read sequentially and never seeked.
+        :param destination: The directory to extract to.
+        :param strip: A directory of the archive whose content is extracted
+               straight into destination, like tar --strip-components
+               but by name. Members outside of it are extracted as is.
+        :param numeric_owner: Whether to only use uid/gid numbers.
+        """
+        if isinstance(source, str):
+            with open(source, "rb", buffering=ArchiveUtils.buffer_size) as f:
+                return ArchiveUtils.extract(f, destination, strip, numeric_owner)
+
+        if not hasattr(source, "peek"):
+            source = io.BufferedReader(source, ArchiveUtils.buffer_size)
+
+        os.makedirs(destination, exist_ok=True)
+        destination = os.path.realpath(destination)
+        compression = ArchiveUtils.get_compression(source)
+
+        kwargs = {"numeric_owner": numeric_owner}
+        if hasattr(tarfile, "fully_trusted_filter"):
+            # members are checked by __safe_members, the default filter of
+            # newer Python versions would also refuse absolute symlinks,
+            # which are legit in a root filesystem
+            kwargs["filter"] = "fully_trusted"
+
+        with ArchiveUtils.__decompress(source, compression) as stream:
+            mode = "r|" if compression == "zst" else "r|*"
+            with tarfile.open(fileobj=stream, mode=mode) as tar:
+                tar.copybufsize = ArchiveUtils.buffer_size
+                tar.extractall(
+                    destination,
+                    members=ArchiveUtils.__safe_members(tar, destination, strip),
+                    **kwargs
+                )
+
+    @staticmethod
+    def __safe_members(tar: tarfile.TarFile, destination: str, strip: str = None):
+        checked_dirs = set()
+        prefix = strip.strip("/") + "/" if strip and strip.strip("/") else None
+
+        def is_within(path: str) -> bool:
+            return os.path.commonpath([destination, path]) == destination
+
+        def strip_prefix(name: str) -> str:
+            if name.startswith("./"):
+                name = name[2:]
+            if name.startswith(prefix):
+                return name[len(prefix):]
+            return name
+
+        for member in tar:
+            if prefix:
+                name = strip_prefix(member.name)
+                if not name or name.rstrip("/") == prefix[:-1]:
+                    # the stripped directory itself, it is the destination
+                    continue
+                member.name = name
+                if member.islnk():
+                    member.linkname = strip_prefix(member.linkname)
+
+            target = os.path.normpath(os.path.join(destination, member.name))
+            if not is_within(target):
+                raise AtomsImageUnsafeMember(member.name)
+
+            # a previously extracted symlink could redirect the member
+            # outside of the destination
+            parent = os.path.dirname(target)
+            if parent not in checked_dirs:
+                if not is_within(os.path.realpath(parent)):
+                    raise AtomsImageUnsafeMember(member.name)
+                checked_dirs.add(parent)
+
+            if member.islnk():
+                link_target = os.path.normpath(
+                    os.path.join(destination, member.linkname))
+                if not is_within(link_target):
+                    raise AtomsImageUnsafeMember(member.name)
+
+            yield member
+
+    @staticmethod
+    def __decompress(source: "io.BufferedReader", compression: str):
+        if compression != "zst":
+            return contextlib.nullcontext(source)
+
+        if zstandard is not None:
+            return zstandard.ZstdDecompressor().stream_reader(
+                source, read_size=ArchiveUtils.buffer_size)
+
+        binary = CommandUtils.which("zstd")
+        if binary is None:
+            raise AtomsImageUnsupportedCompression(compression)
+
+        return _PipeDecompressor([binary, "-dc"], source)
+
+
+class _PipeDecompressor:
+    """
+    Decompress a stream through an external binary, the source is fed to
+    its stdin by a thread while the decompressed output is read from its
+    stdout.
+    """
+
+    def __init__(self, command: list, source: "io.BufferedReader"):
+        self.__proc = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.__feeder = threading.Thread(
+            target=self.__feed, args=(source,), daemon=True)
+        self.__feeder.start()
+
+    def __feed(self, source: "io.BufferedReader"):
+        try:
+            while True:
+                data = source.read(ArchiveUtils.buffer_size)
+                if not data:
+                    break
+                self.__proc.stdin.write(data)
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                self.__proc.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def __enter__(self):
+        return self.__proc.stdout
+
+    def __exit__(self, *args):
+        self.__proc.stdout.close()
+        self.__feeder.join()
+        if self.__proc.wait() != 0 and args[0] is None:
+            raise tarfile.ReadError("zstd failed to decompress the archive")
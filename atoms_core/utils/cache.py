@@ -0,0 +1,76 @@
+# cache.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import threading
+
+
+class TTLCache:
+    """
+    A thread safe in-memory cache which entries expire ttl seconds after
+    being set. Expired entries are dropped on access.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.__entries = {}
+        self.__key_locks = {}
+        self.__lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return default
+
+            value, expires = entry
+            if time.monotonic() >= expires:
+                del self.__entries[key]
+                return default
+
+            return value
+
+    def set(self, key, value):
+        with self.__lock:
+            self.__entries[key] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self, key=None):
+        """Drop the given entry, or every entry if key is None."""
+        with self.__lock:
+            if key is None:
+                self.__entries.clear()
+            else:
+                self.__entries.pop(key, None)
+
+    def get_or_set(self, key, func: callable):
+        """
+        Returns the cached value for key, calling func to compute and store
+        it on a miss. Concurrent misses on the same key only call func once.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self.__key_lock(key):
+            value = self.get(key)
+            if value is None:
+                value = func()
+                self.set(key, value)
+            return value
+
+    def __key_lock(self, key) -> threading.Lock:
+        with self.__lock:
+            return self.__key_locks.setdefault(key, threading.Lock())
@@ -19,18 +19,19 @@ import os
 import copy
 import shutil
 import logging
+import threading
 import subprocess
 import contextlib
 from typing import Union
-from functools import lru_cache
-
-from atoms_core.exceptions.common import AtomsNoBinaryFound
 
 
 logger = logging.getLogger("atoms.utils.command")
 
 
 class CommandUtils:
+    # (binary, PATH) for the running system, (binary, True) for the host
+    __which_cache = {}
+    __which_lock = threading.Lock()
 
     @staticmethod
     def is_flatpak() -> bool:
@@ -44,7 +45,7 @@ class CommandUtils:
         """
         Returns a flatpak-spawn command for the given command.
         """
-        binary_path = shutil.which("flatpak-spawn")
+        binary_path = CommandUtils.which("flatpak-spawn")
         return [binary_path, "--host"] + command
 
     @staticmethod
@@ -57,23 +58,64 @@ class CommandUtils:
         :param binary: The binary to find in the host system.
         :return: The path to the binary in the host system.
         """
+        return CommandUtils.flatpak_host_which_many([binary])[binary]
+
+    @staticmethod
+    def flatpak_host_which_many(binaries: list) -> dict:
+        """
+        Like flatpak_host_which but resolves all the binaries not cached
+        yet with a single flatpak-spawn call.
+
+        :param binaries: The binaries to find in the host system.
+        :return: A dict with the path of each binary, None if not found.
+        """
+        paths = {}
+        missing = []
+        with CommandUtils.__which_lock:
+            for binary in binaries:
+                key = (binary, True)
+                if key in CommandUtils.__which_cache:
+                    paths[binary] = CommandUtils.__which_cache[key]
+                else:
+                    missing.append(binary)
+
+        if not missing:
+            return paths
+
+        flatpak_spawn = CommandUtils.which("flatpak-spawn")
+        if flatpak_spawn is None:
+            return {**paths, **{binary: None for binary in missing}}
+
+        script = 'export PATH=$PATH:/usr/lib/apx/; ' \
+            'for b in "$@"; do echo "$b=$(which "$b" 2>/dev/null)"; done'
         try:
             proc = subprocess.check_output(
-                CommandUtils.get_flatpak_command(
-                    ["sh", "-c", "export PATH=$PATH:/usr/lib/apx/ && which " + binary]
-                )
+                [flatpak_spawn, "--host", "sh", "-c", script, "sh"] + missing
             )
-            return proc.decode("utf-8").strip()
-        except (FileNotFoundError, AtomsNoBinaryFound):
-            return
+        except FileNotFoundError:
+            return {**paths, **{binary: None for binary in missing}}
         except subprocess.CalledProcessError:
             logger.debug("Atoms has no access to org.freedesktop.Flatpak")
-            return
+            return {**paths, **{binary: None for binary in missing}}
+
+        found = {}
+        for line in proc.decode("utf-8").splitlines():
+            binary, _, path = line.partition("=")
+            found[binary] = path.strip() or None
+
+        with CommandUtils.__which_lock:
+            for binary in missing:
+                paths[binary] = found.get(binary)
+                CommandUtils.__which_cache[(binary, True)] = paths[binary]
+
+        return paths
 
     @staticmethod
     def which(binary: str, allow_flatpak_host: bool = False) -> str:
         """
-        Returns the path to the binary in the host system.
+        Returns the path to the binary in the host system. Results, misses
+        included, are cached for the whole process, call invalidate_which
+        after installing a binary.
 
         :param binary: The binary to find in the host system.
         :param allow_flatpak_host: Whether to search the host system if Atoms 
@@ -81,7 +123,43 @@ class CommandUtils:
         """
         if allow_flatpak_host and CommandUtils.is_flatpak():
             return CommandUtils.flatpak_host_which(binary)
-        return shutil.which(binary)
+
+        key = (binary, os.environ.get("PATH"))
+        with CommandUtils.__which_lock:
+            if key in CommandUtils.__which_cache:
+                return CommandUtils.__which_cache[key]
+
+        path = shutil.which(binary)
+        with CommandUtils.__which_lock:
+            CommandUtils.__which_cache[key] = path
+        return path
+
+    @staticmethod
+    def which_many(binaries: list, allow_flatpak_host: bool = False) -> dict:
+        """
+        Resolve several binaries at once, in a single flatpak-spawn call
+        when searching the host system.
+
+        :param binaries: The binaries to find in the host system.
+        :param allow_flatpak_host: See which.
+        """
+        if allow_flatpak_host and CommandUtils.is_flatpak():
+            return CommandUtils.flatpak_host_which_many(binaries)
+        return {binary: CommandUtils.which(binary) for binary in binaries}
+
+    @staticmethod
+    def invalidate_which(binary: str = None):
+        """
+        Forget the cached paths of binary, or of every binary, e.g. after
+        installing one.
+        """
+        with CommandUtils.__which_lock:
+            if binary is None:
+                CommandUtils.__which_cache.clear()
+                return
+            for key in list(CommandUtils.__which_cache):
+                if key[0] == binary:
+                    del CommandUtils.__which_cache[key]
 
     @staticmethod
     def remove_formatting(output: str) -> str:
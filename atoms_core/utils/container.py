@@ -0,0 +1,78 @@
+# container.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+import datetime
+
+
+class ContainerUtils:
+
+    @staticmethod
+    def format_date(value) -> str:
+        """
+        Convert a container creation date as returned by podman (unix
+        timestamp or RFC 3339 string with nanoseconds) to the local
+        isoformat used by the atoms.
+        """
+        if isinstance(value, (int, float)):
+            date = datetime.datetime.fromtimestamp(value)
+        elif re.match(r"^\S+ \S+ [+-]\d{4}", value):
+            # docker, e.g. 2022-11-01 10:00:00 +0100 CET
+            day, time, offset = value.split(" ")[:3]
+            date = datetime.datetime.fromisoformat(
+                f"{day}T{time}{offset[:3]}:{offset[3:]}")
+            date = date.astimezone().replace(tzinfo=None)
+        else:
+            # before 3.11 python only parses fractions of exactly 3 or 6
+            # digits and no Z suffix, RFC 3339 allows 1 to 9 digits
+            value = re.sub(
+                r"\.(\d+)", lambda m: "." + m.group(1)[:6].ljust(6, "0"),
+                value.strip())
+            value = re.sub(r"[Zz]$", "+00:00", value)
+            date = datetime.datetime.fromisoformat(value)
+            if date.tzinfo is not None:
+                date = date.astimezone().replace(tzinfo=None)
+
+        return date.strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+    @staticmethod
+    def from_podman(entry: dict) -> tuple:
+        """
+        Normalize a container listed by the Podman API, by
+        'podman ps --format json' or by 'docker ps --format "{{json .}}"',
+        returns its short id and info.
+        """
+        names = entry.get("Names") or [""]
+        if isinstance(names, str):
+            names = names.split(",")
+
+        labels = entry.get("Labels") or {}
+        if isinstance(labels, str):
+            labels = dict(
+                label.partition("=")[::2] for label in labels.split(",") if label)
+
+        created = entry.get("Created")
+        if created is None or created == "":
+            created = entry.get("CreatedAt")
+
+        container_id = entry.get("Id") or entry["ID"]
+        return container_id[:12], {
+            "image": entry.get("Image", ""),
+            "name": names[0].lstrip("/"),
+            "creation_date": ContainerUtils.format_date(created),
+            "state": (entry.get("State") or "").lower(),
+            "labels": labels,
+        }
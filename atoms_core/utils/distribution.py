@@ -15,80 +15,98 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from atoms_core.exceptions.distribution import AtomsUnknownDistribution
+from atoms_core.entities.catalog import AtomsCatalogSnapshot
 from atoms_core.entities.distribution import AtomDistribution
-from atoms_core.entities.distributions import *
+from atoms_core.entities.distributions.registry import AtomsDistributionRegistry
+from atoms_core.models.result import ResultModel
+
+
+logger = logging.getLogger("atoms.utils.distribution")
 
 
 class AtomsDistributionsUtils:
+    """
+    Distributions are shared instances from AtomsDistributionRegistry,
+    they must not be modified by the callers.
+    """
+
     @staticmethod
     def get_distribution(distribution_id: str) -> AtomDistribution:
-        # Stable (know-working) images
-        if distribution_id == "alpinelinux":
-            return AlpineLinux()
-        if distribution_id == "ubuntu":
-            return Ubuntu()
-        if distribution_id == "fedora":
-            return Fedora()
-        if distribution_id == "almalinux":
-            return AlmaLinux()
-        if distribution_id == "rockylinux":
-            return RockyLinux()
-        if distribution_id == "centos":
-            return Centos()
-        if distribution_id == "voidlinux":
-            return VoidLinux()
-        if distribution_id == "debian":
-            return Debian()
-        if distribution_id == "vanilla":
-            return VanillaOS()
-        if distribution_id == "opensuse":
-            return OpenSuse()
-        if distribution_id == "gentoo":
-            return Gentoo()
-
-        # Experimental images
-        if distribution_id == "archlinux":  # pacman broken
-            return ArchLinux()
-
-        # Unimplemented images
-        # if distribution_id == "fedora":
-        #     return Fedora()
-        # if distribution_id == "debian": # missing compatible tarball (no raw image)
-        #     return Debian()
-
-        return Unknown()
+        return AtomsDistributionRegistry.get(distribution_id)
 
     @staticmethod
     def get_distribution_by_container_image(image: str) -> AtomDistribution:
-        for distribution in AtomsDistributionsUtils.get_distributions():
-            if distribution.is_container_image(image):
-                return distribution
-        return Unknown()
+        return AtomsDistributionRegistry.get_by_container_image(
+            image, "SHOW_EXPERIMENTAL_IMAGES" in os.environ)
 
     @staticmethod
     def get_distributions() -> list:
-        distributions = [
-            AlpineLinux(),
-            Ubuntu(),
-            Fedora(),
-            AlmaLinux(),
-            RockyLinux(),
-            Centos(),
-            Debian(),
-            VanillaOS(),
-            OpenSuse(),
-            Gentoo(),
-        ]
-        if "SHOW_EXPERIMENTAL_IMAGES" in os.environ:
-            distributions.append(ArchLinux())
-            distributions.append(VoidLinux())  # libc.so.6 not found
-        return distributions
+        return AtomsDistributionRegistry.get_all(
+            "SHOW_EXPERIMENTAL_IMAGES" in os.environ)
 
     @staticmethod
     def get_distribution_by_image(image: "AtomImage") -> AtomDistribution:
-        for distribution in AtomsDistributionsUtils.get_distributions():
+        """
+        Returns the distribution of the image. Images are named after
+        their distribution id (see AtomDistribution.get_image_name), so it
+        is looked up by prefix, other names fall back to a full scan.
+        """
+        experimental = "SHOW_EXPERIMENTAL_IMAGES" in os.environ
+        distribution_ids = AtomsDistributionRegistry.get_ids(experimental)
+        distribution_id = image.distribution_id \
+            or image.name.lower().split("-", 1)[0]
+        if distribution_id in distribution_ids:
+            return AtomsDistributionRegistry.get(distribution_id)
+
+        for distribution in AtomsDistributionRegistry.get_all(experimental):
             if distribution.is_image(image):
                 return distribution
-        return Unknown()
+        return AtomsDistributionRegistry.get("unknown")
+
+    @staticmethod
+    def refresh_catalog(
+        instance: "AtomsInstance",
+        distributions: list = None,
+        max_workers: int = 8
+    ) -> AtomsCatalogSnapshot:
+        """
+        Resolve the latest remote image of every distribution, release and
+        architecture concurrently, recording them in the instance catalog.
+        A failing entry does not stop the others, its error is reported
+        in the returned snapshot. The cached remote builds are dropped
+        first, so the build directories are listed again.
+
+        :param instance: The instance providing the HTTP client and catalog.
+        :param distributions: The distributions to refresh, defaults to
+               get_distributions().
+        :param max_workers: Maximum number of concurrent resolutions.
+        """
+        if distributions is None:
+            distributions = AtomsDistributionsUtils.get_distributions()
+
+        jobs = []
+        for distribution in distributions:
+            distribution.invalidate_remote_builds()
+            for release in distribution.releases:
+                for architecture in distribution.architectures.values():
+                    jobs.append((distribution, release, architecture))
+
+        def resolve(job: tuple) -> ResultModel:
+            distribution, release, architecture = job
+            try:
+                return ResultModel(True, distribution.resolve(architecture, release, instance))
+            except Exception as e:  # report any failure per entry
+                logger.warning(
+                    f"Failed to resolve {distribution.distribution_id} {release} {architecture}: {e}")
+                return ResultModel(False, message=str(e))
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            results = executor.map(resolve, jobs)
+            return AtomsCatalogSnapshot({
+                (job[0].distribution_id, job[1], job[2]): result
+                for job, result in zip(jobs, results)
+            })
@@ -16,23 +16,146 @@
 
 import os
 import time
+import orjson
 import logging
+import threading
 import requests
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from urllib3.exceptions import ProtocolError
 
-from atoms_core.utils.file import FileUtils
 from atoms_core.utils.hash import HashUtils
-from atoms_core.exceptions.download import AtomsHashMissmatchError
+from atoms_core.utils.progress import ProgressReporter
+from atoms_core.exceptions.download import AtomsHashMissmatchError, \
+    AtomsRangeNotSupported, AtomsIncompleteDownload, AtomsDownloadCancelled
 
 
 logger = logging.getLogger("atoms.download")
 
 
+class ChunkReader:
+    """
+    Read the body of a streamed requests response in chunks which size
+    adapts to the measured throughput: each chunk should take about
+    target_time seconds to arrive, within min_chunk and max_chunk.
+
+    Chunks are read with readinto in a single preallocated buffer and
+    yielded as memoryview slices, so no bytes object is allocated while
+    streaming. A yielded chunk is only valid until the next iteration,
+    consumers must write or hash it right away.
+
+    The body length is checked against Content-Length, a connection
+    closed early raises AtomsIncompleteDownload instead of ending the
+    iteration as if the body was complete.
+    """
+    min_chunk: int = 64 * 1024
+    max_chunk: int = 4 * 1024 * 1024
+    target_time: float = 0.1
+
+    def __init__(self, response: "requests.Response", min_chunk: int = None, max_chunk: int = None):
+        if min_chunk is not None:
+            self.min_chunk = min_chunk
+        if max_chunk is not None:
+            self.max_chunk = max(max_chunk, self.min_chunk)
+
+        self.__response = response
+        self.__fp = self.__get_fp(response)
+        self.__view = memoryview(bytearray(self.max_chunk))
+        self.chunk_size = self.min_chunk
+
+        if self.__fp is None:
+            response.raw.decode_content = True
+
+    @staticmethod
+    def __get_fp(response: "requests.Response") -> http.client.HTTPResponse:
+        # urllib3 reads allocate a new bytes object each time; the
+        # underlying http.client response (private to urllib3) reads
+        # straight into our buffer, it can be used as long as it is
+        # there and there is no content encoding to undo
+        fp = getattr(response.raw, "_fp", None)
+        if isinstance(fp, http.client.HTTPResponse) \
+                and not response.headers.get("content-encoding"):
+            return fp
+        return None
+
+    def __readinto(self, view: memoryview) -> int:
+        if self.__fp is not None:
+            return self.__fp.readinto(view)
+
+        data = self.__response.raw.read(len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    def __iter__(self):
+        # with a content encoding the length is the one of the encoded body
+        headers = self.__response.headers
+        expected = None
+        if headers.get("content-length") and not headers.get("content-encoding"):
+            expected = int(headers["content-length"])
+        received = 0
+
+        while True:
+            start = time.monotonic()
+            try:
+                size = self.__readinto(self.__view[:self.chunk_size])
+            except (http.client.IncompleteRead, ProtocolError):
+                raise AtomsIncompleteDownload(
+                    self.__response.url, expected, received)
+            if not size:
+                if expected is not None and received != expected:
+                    raise AtomsIncompleteDownload(
+                        self.__response.url, expected, received)
+                self.__release()
+                return
+
+            received += size
+
+            elapsed = time.monotonic() - start
+            yield self.__view[:size]
+
+            if size == self.chunk_size:
+                self.__adapt(size, elapsed)
+
+    def __release(self):
+        # urllib3 does not know the body was consumed through the
+        # underlying response, give the connection back to the pool
+        # ourselves so it can be reused
+        if self.__fp is not None:
+            self.__response.raw.release_conn()
+
+    def __adapt(self, size: int, elapsed: float):
+        if elapsed < self.target_time / 2 and self.chunk_size < self.max_chunk:
+            self.chunk_size = min(self.chunk_size * 2, self.max_chunk)
+        elif elapsed > self.target_time * 2 and self.chunk_size > self.min_chunk:
+            self.chunk_size = max(self.chunk_size // 2, self.min_chunk)
+
+
 class DownloadUtils:
     """
-    Download a resource from a given URL. It shows and update a progress
-    bar while downloading but can also be used to update external progress
-    bars using the func parameter.
+    Download a resource from a given URL. The progress is reported to the
+    func callback (executed on the main thread) and to the optional sinks,
+    e.g. a TerminalProgressSink to show a progress bar, see
+    ProgressReporter for how updates are coalesced.
+
+    When the remote supports HTTP Range requests, the resource is fetched
+    in concurrent segments into a preallocated <file>.part file, and the
+    progress of each segment is persisted in <file>.part.json so that an
+    interrupted download can be resumed by the next call. Remotes without
+    Range support are downloaded in a single stream.
+
+    Setting cancel_event stops the download at the next chunk, download
+    then raises AtomsDownloadCancelled and keeps the partial file.
+
+    When a tee stream is given, each chunk is also written to it as it
+    arrives, e.g. to extract the archive while it downloads. Since the
+    tee needs the data in order, the resource is then downloaded as a
+    single segment: on resume, the contiguous prefix already in the
+    .part file is replayed into the tee before the rest is requested.
+    Without Range support the .part file is rewritten from the start.
     """
+    segments: int = 4
+    min_segment_size: int = 8 * 1024 * 1024
+    headers: dict = {"User-Agent": "curl/7.79.1"}
 
     def __init__(
         self,
@@ -42,7 +165,11 @@ class DownloadUtils:
         func: callable = None,
         hash_value: str = None,
         hash_type: str = None,
-        rename: str = None
+        rename: str = None,
+        segments: int = None,
+        sinks: list = None,
+        cancel_event: threading.Event = None,
+        tee: "io.BufferedIOBase" = None
     ):
         self.__instance = instance
         self.start_time = None
@@ -53,69 +180,346 @@ class DownloadUtils:
         self.hash_type = hash_type
         self.rename = rename
 
+        if segments is not None:
+            self.segments = max(1, segments)
+
+        self.__lock = threading.Lock()
+        self.__abort = threading.Event()
+        self.__cancel_event = cancel_event
+        self.__tee = tee
+        self.__reporter = ProgressReporter(
+            instance, os.path.basename(rename or file), func, sinks)
+        self.__segment_map = None
+        self.__unsaved = 0
+        self.__hasher = None
+        self.__hashed = 0
+        self.__hash_lock = threading.Lock()
+
+    @property
+    def part_file(self) -> str:
+        return f"{self.file}.part"
+
+    @property
+    def map_file(self) -> str:
+        return f"{self.file}.part.json"
+
     def download(self) -> bool:
-        """Start the download."""
+        """
+        Start the download. If an hash is provided, the digest is updated
+        on each received chunk and checked as soon as the last byte is
+        written, so no extra read of the file is needed. Segmented
+        downloads arrive out of order, their digest follows the contiguous
+        prefix of the file as it grows: chunks are hashed as they arrive
+        when they extend it, the others are read back (from the page
+        cache) once the segments before them are complete.
+        """
+        hasher = None
+        if None not in [self.hash_value, self.hash_type]:
+            hasher = HashUtils.get_hasher(self.hash_type)
+
         try:
-            with open(self.file, "wb") as file:
-                self.start_time = time.time()
-                headers = {"User-Agent": "curl/7.79.1"}
-                response = requests.get(self.url, stream=True, headers=headers)
-                total_size = int(response.headers.get("content-length", 0))
-                block_size = 1024
-                count = 0
-
-                if total_size != 0:
-                    for data in response.iter_content(block_size):
-                        file.write(data)
-                        count += 1
-                        if self.func:
-                            self.__instance.client_bridge.exec_on_main(
-                                self.func,
-                                count,
-                                block_size,
-                                total_size
-                            )
-                            self.__progress(count, block_size, total_size)
-                else:
-                    file.write(response.content)
-                    if self.func is not None:
-                        self.__instance.client_bridge.exec_on_main(
-                            self.func, 1, 1, 1)
-                        self.__progress(1, 1, 1)
+            self.start_time = time.time()
+            total_size, validator, url = self.__probe()
+
+            if total_size and validator is not None:
+                try:
+                    self.__download_segmented(
+                        url, total_size, validator, hasher)
+                except AtomsRangeNotSupported:
+                    logger.warning(
+                        "Remote ignored the range request, falling back to a single stream.")
+                    self.__discard_part()
+                    if hasher:
+                        hasher = HashUtils.get_hasher(self.hash_type)
+                    self.__download_stream(hasher)
+            else:
+                self.__download_stream(hasher)
+
+            self.__reporter.finish()
         except requests.exceptions.SSLError:
             logger.error(
                 "Download failed due to a SSL error. Your system may have a wrong date/time or wrong certificates.")
             return False
-        except (requests.exceptions.RequestException, OSError):
+        except (requests.exceptions.RequestException, OSError, AtomsIncompleteDownload):
             logger.error("Download failed! Check your internet connection.")
             return False
 
-        if None not in [self.hash_value, self.hash_type]:
-            _hash = HashUtils.get_hash(self.file, self.hash_type)
+        if hasher:
+            _hash = hasher.hexdigest()
             if _hash != self.hash_value:
                 logger.error(
                     f"Download failed! The downloaded file is corrupted.\n\tExpected {self.hash_value} got {_hash}.")
+                self.__discard_part()
                 raise AtomsHashMissmatchError()
 
+        os.replace(self.part_file, self.file)
+        if os.path.exists(self.map_file):
+            os.remove(self.map_file)
+
         if self.rename:
             os.rename(self.file, os.path.join(
                 os.path.dirname(self.file), self.rename))
 
         return True
 
-    def __progress(self, count, block_size, total_size):
-        """Update the progress bar."""
-        percent = int(count * block_size * 100 / total_size)
-        done_str = FileUtils.get_human_size(count * block_size)
-        total_str = FileUtils.get_human_size(total_size)
-        speed_str = FileUtils.get_human_size(
-            count * block_size / (time.time() - self.start_time))
-        name = self.file.split("/")[-1]
-        c_close, c_complete, c_incomplete = "\033[0m", "\033[92m", "\033[90m"
-        print(
-            f"\r{c_incomplete if percent < 100 else c_complete}{name} ({percent}%) \
-{'━' * int(percent / 2)} ({done_str}/{total_str} - {speed_str})",
-            end=""
-        )
-        if percent == 100:
-            print(f"{c_close}\n")
+    def __probe(self) -> tuple:
+        """
+        Ask the remote for the resource size and whether it accepts range
+        requests. Returns the size, a validator (ETag or Last-Modified,
+        None if ranges are not supported) and the final URL after any
+        redirect.
+        """
+        response = self.__instance.http_client.head(
+            self.url, headers=self.headers)
+        if response.status_code != 200:
+            return 0, None, self.url
+
+        total_size = int(response.headers.get("content-length", 0))
+        if response.headers.get("accept-ranges", "").lower() != "bytes" \
+                or response.headers.get("content-encoding"):
+            return total_size, None, self.url
+
+        validator = response.headers.get("etag") \
+            or response.headers.get("last-modified") or ""
+        return total_size, validator, response.url
+
+    def __download_stream(self, hasher: "hashlib._Hash" = None):
+        """Download the resource in a single stream, without resume."""
+        with open(self.part_file, "wb") as file, self.__instance.http_client.get(
+                self.url, stream=True, headers=self.headers) as response:
+            response.raise_for_status()
+            total_size = int(response.headers.get("content-length", 0))
+            self.__reporter.start(total_size)
+
+            for data in ChunkReader(response):
+                self.__check_cancelled()
+                file.write(data)
+                if self.__tee is not None:
+                    self.__tee.write(data)
+                if hasher:
+                    hasher.update(data)
+                self.__reporter.update(len(data))
+
+    def __download_segmented(
+        self, url: str, total_size: int, validator: str,
+        hasher: "hashlib._Hash" = None
+    ):
+        """
+        Download the resource in concurrent segments, resuming from the
+        segment map if it matches the remote resource.
+        """
+        self.__segment_map = self.__load_segment_map(total_size, validator)
+
+        # the tee needs the data in order, the download goes on as a single
+        # segment from the contiguous prefix, which is replayed into it
+        if self.__tee is not None and self.__segment_map is not None:
+            self.__segment_map["segments"] = [{
+                "start": 0, "end": total_size - 1,
+                "done": self.__get_prefix_size(),
+            }]
+
+        if self.__segment_map is None:
+            self.__segment_map = {
+                "url": self.url,
+                "size": total_size,
+                "validator": validator,
+                "segments": self.__plan_segments(total_size),
+            }
+            with open(self.part_file, "wb") as file:
+                try:
+                    os.posix_fallocate(file.fileno(), 0, total_size)
+                except (AttributeError, OSError):
+                    file.truncate(total_size)
+            self.__save_segment_map()
+        else:
+            logger.info(f"Resuming download of {self.url}")
+
+        segments = self.__segment_map["segments"]
+        self.__reporter.start(
+            total_size, sum(segment["done"] for segment in segments))
+        pending = [
+            segment for segment in segments
+            if segment["start"] + segment["done"] <= segment["end"]
+        ]
+
+        self.__hasher = hasher
+        self.__hashed = 0
+
+        fd = os.open(self.part_file, os.O_RDWR)
+        try:
+            if self.__tee is not None and not pending:
+                self.__replay(fd, total_size)
+
+            with ThreadPoolExecutor(max_workers=max(1, len(pending))) as executor:
+                futures = [
+                    executor.submit(self.__fetch_segment, fd, url, segment)
+                    for segment in pending
+                ]
+                errors = [future.exception() for future in futures]
+
+            # segments already complete when resuming are only hashed here
+            if not any(errors):
+                self.__hash_prefix(fd)
+        finally:
+            os.close(fd)
+            with self.__lock:
+                self.__save_segment_map()
+
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def __fetch_segment(self, fd: int, url: str, segment: dict):
+        offset = segment["start"] + segment["done"]
+        headers = dict(self.headers)
+        headers["Range"] = f"bytes={offset}-{segment['end']}"
+
+        try:
+            with self.__instance.http_client.get(
+                    url, stream=True, headers=headers) as response:
+                if response.status_code != 206:
+                    raise AtomsRangeNotSupported(url)
+
+                # with a tee there is a single segment, starting at 0
+                if self.__tee is not None:
+                    self.__replay(fd, offset)
+
+                for data in ChunkReader(response):
+                    if self.__abort.is_set():
+                        return
+                    self.__check_cancelled()
+
+                    written = 0
+                    while written < len(data):
+                        written += os.pwrite(fd, data[written:], offset + written)
+                    offset += len(data)
+                    if self.__tee is not None:
+                        self.__tee.write(data)
+
+                    with self.__lock:
+                        segment["done"] += len(data)
+                        self.__unsaved += len(data)
+                        if self.__unsaved >= self.min_segment_size:
+                            self.__save_segment_map()
+
+                    self.__hash_prefix(fd, offset - len(data), data)
+                    self.__reporter.update(len(data))
+        except Exception:
+            self.__abort.set()
+            raise
+
+        if offset != segment["end"] + 1:
+            self.__abort.set()
+            raise AtomsIncompleteDownload(
+                url, segment["end"] + 1 - segment["start"],
+                offset - segment["start"])
+
+    def __check_cancelled(self):
+        if self.__cancel_event is not None and self.__cancel_event.is_set():
+            raise AtomsDownloadCancelled(self.url)
+
+    def __plan_segments(self, total_size: int) -> list:
+        if self.__tee is not None:
+            return [{"start": 0, "end": total_size - 1, "done": 0}]
+
+        count = min(self.segments, max(1, total_size // self.min_segment_size))
+        size = total_size // count
+        segments = []
+
+        for i in range(count):
+            start = i * size
+            end = total_size - 1 if i == count - 1 else start + size - 1
+            segments.append({"start": start, "end": end, "done": 0})
+
+        return segments
+
+    def __load_segment_map(self, total_size: int, validator: str) -> dict:
+        if not os.path.exists(self.map_file) or not os.path.exists(self.part_file):
+            return None
+
+        try:
+            with open(self.map_file, "rb") as f:
+                segment_map = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+
+        if segment_map.get("url") != self.url \
+                or segment_map.get("size") != total_size \
+                or segment_map.get("validator") != validator \
+                or os.path.getsize(self.part_file) != total_size:
+            logger.info("Remote resource changed, restarting download.")
+            return None
+
+        return segment_map
+
+    def __save_segment_map(self):
+        """Persist the segment map, the caller must hold the lock."""
+        with open(self.map_file, "wb") as f:
+            f.write(orjson.dumps(self.__segment_map))
+        self.__unsaved = 0
+
+    def __get_prefix_size(self) -> int:
+        """Size of the contiguous written prefix of the .part file."""
+        size = 0
+        for segment in self.__segment_map["segments"]:
+            if segment["start"] != size:
+                break
+            size = segment["start"] + segment["done"]
+            if size <= segment["end"]:
+                break
+        return size
+
+    def __replay(self, fd: int, size: int):
+        """
+        Write the first size bytes of the .part file to the tee, they are
+        hashed with the rest of the prefix, see __hash_prefix.
+        """
+        view = memoryview(bytearray(ChunkReader.max_chunk))
+        offset = 0
+        while offset < size:
+            read = os.preadv(fd, [view[:min(len(view), size - offset)]], offset)
+            if not read:
+                raise AtomsIncompleteDownload(self.url, size, offset)
+            self.__tee.write(view[:read])
+            offset += read
+
+    def __discard_part(self):
+        for path in [self.part_file, self.map_file]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def __hash_prefix(self, fd: int, offset: int = None, data: memoryview = None):
+        """
+        Extend the digest over the contiguous written prefix of the file.
+        data, just written at offset, is hashed as is when it starts where
+        the digest stopped, the rest of the prefix is read back from fd.
+        """
+        if self.__hasher is None:
+            return
+
+        with self.__hash_lock:
+            if data is not None and offset == self.__hashed:
+                self.__hasher.update(data)
+                self.__hashed += len(data)
+
+            view = None
+            for segment in self.__segment_map["segments"]:
+                written = segment["start"] + segment["done"]
+                if self.__hashed < segment["start"]:
+                    break
+                if self.__hashed >= written:
+                    continue
+
+                if view is None:
+                    view = memoryview(bytearray(ChunkReader.max_chunk))
+                while self.__hashed < written:
+                    size = os.preadv(
+                        fd, [view[:min(len(view), written - self.__hashed)]],
+                        self.__hashed)
+                    if not size:
+                        return
+                    self.__hasher.update(view[:size])
+                    self.__hashed += size
+
+                if written <= segment["end"]:
+                    break
@@ -15,13 +15,27 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import stat
+import fcntl
+import errno
+import shutil
+import logging
+import tempfile
 from pathlib import Path
 from typing import Union
 
 from atoms_core.utils.command import CommandUtils
 
 
+logger = logging.getLogger("atoms.utils.file")
+
+# from linux/fs.h, _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+
 class FileUtils:
+    # st_dev -> whether the filesystem supports reflinks
+    __reflink_support = {}
 
     @staticmethod
     def get_human_size(size: float) -> str:
@@ -52,3 +66,95 @@ class FileUtils:
         if option is None:
             option = "-rf"
         CommandUtils.run_command([("rm", "bin"), option, path], wait=True)
+
+    @staticmethod
+    def supports_reflink(path: str) -> bool:
+        """
+        Whether files in the given directory can be cloned with a reflink,
+        probed once per filesystem.
+        """
+        device = os.stat(path).st_dev
+        if device in FileUtils.__reflink_support:
+            return FileUtils.__reflink_support[device]
+
+        supported = True
+        with tempfile.TemporaryFile(dir=path) as fsrc, \
+                tempfile.TemporaryFile(dir=path) as fdst:
+            fsrc.write(b"reflink")
+            fsrc.flush()
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            except OSError:
+                supported = False
+
+        FileUtils.__reflink_support[device] = supported
+        return supported
+
+    @staticmethod
+    def clone_tree(source: str, destination: str) -> str:
+        """
+        Clone a directory tree into destination, which can already exist.
+        Files are cloned with a reflink (FICLONE) when the filesystem
+        supports it, so they share their data until modified, otherwise
+        they are copied. Hard links inside the tree are preserved, special
+        files are skipped. Returns the method used, "reflink" or "copy".
+        """
+        state = {"reflink": True, "inodes": {}}
+        directories = []
+
+        def clone_file(src: str, dst: str, st: os.stat_result):
+            key = (st.st_dev, st.st_ino)
+            if st.st_nlink > 1 and key in state["inodes"]:
+                os.link(state["inodes"][key], dst)
+                return
+
+            if state["reflink"]:
+                with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                    try:
+                        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                    except OSError as e:
+                        if e.errno not in [errno.EOPNOTSUPP, errno.EXDEV,
+                                           errno.EINVAL, errno.ENOTTY]:
+                            raise
+                        logger.debug(f"Reflinks not supported, copying: {e}")
+                        state["reflink"] = False
+
+            if not state["reflink"]:
+                shutil.copyfile(src, dst)
+
+            shutil.copystat(src, dst)
+            if st.st_nlink > 1:
+                state["inodes"][key] = dst
+
+        def walk(src_dir: str, dst_dir: str):
+            os.makedirs(dst_dir, exist_ok=True)
+            directories.append((src_dir, dst_dir))
+
+            with os.scandir(src_dir) as entries:
+                for entry in entries:
+                    dst = os.path.join(dst_dir, entry.name)
+                    st = entry.stat(follow_symlinks=False)
+
+                    if stat.S_ISDIR(st.st_mode):
+                        walk(entry.path, dst)
+                    elif stat.S_ISLNK(st.st_mode):
+                        if os.path.isdir(dst) and not os.path.islink(dst):
+                            # keep directories created ahead of the clone
+                            logger.debug(f"Not replacing directory: {dst}")
+                            continue
+                        if os.path.lexists(dst):
+                            os.unlink(dst)
+                        os.symlink(os.readlink(entry.path), dst)
+                    elif stat.S_ISREG(st.st_mode):
+                        clone_file(entry.path, dst, st)
+                    else:
+                        logger.debug(f"Skipping special file: {entry.path}")
+
+        walk(source, destination)
+
+        # directories permissions are restored last, deepest first, since
+        # read-only ones would prevent creating their content
+        for src_dir, dst_dir in reversed(directories):
+            shutil.copystat(src_dir, dst_dir)
+
+        return "reflink" if state["reflink"] else "copy"
@@ -14,27 +14,33 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import os
 import hashlib
 
 
 class HashUtils:
 
     @staticmethod
-    def get_hash(file_path: str, hash_type: str) -> str:
+    def get_hasher(hash_type: str) -> "hashlib._Hash":
         """
-        Get the hash of a file.
+        Get a new hash object for the given hash type, to be fed
+        incrementally (e.g. while streaming a download).
         """
         if hash_type == "md5":
-            hash_temp = hashlib.md5()
+            return hashlib.md5()
         elif hash_type == "sha256":
-            hash_temp = hashlib.sha256()
+            return hashlib.sha256()
         elif hash_type == "sha512":
-            hash_temp = hashlib.sha512()
+            return hashlib.sha512()
         elif hash_type == "sha1":
-            hash_temp = hashlib.sha1()
-        else:
-            raise ValueError("Invalid hash type")
+            return hashlib.sha1()
+        raise ValueError("Invalid hash type")
+
+    @staticmethod
+    def get_hash(file_path: str, hash_type: str) -> str:
+        """
+        Get the hash of a file.
+        """
+        hash_temp = HashUtils.get_hasher(hash_type)
 
         with open(file_path, "rb") as f:
             while True:
@@ -49,16 +55,6 @@ class HashUtils:
         """
         Get the hash of a string.
         """
-        if hash_type == "md5":
-            hash_temp = hashlib.md5()
-        elif hash_type == "sha256":
-            hash_temp = hashlib.sha256()
-        elif hash_type == "sha512":
-            hash_temp = hashlib.sha512()
-        elif hash_type == "sha1":
-            hash_temp = hashlib.sha1()
-        else:
-            raise ValueError("Invalid hash type")
-
+        hash_temp = HashUtils.get_hasher(hash_type)
         hash_temp.update(string.encode("utf-8"))
         return hash_temp.hexdigest()
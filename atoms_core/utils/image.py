@@ -15,17 +15,31 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
-import time
-import requests
+import threading
 
 from atoms_core.utils.file import FileUtils
 from atoms_core.utils.download import DownloadUtils
+from atoms_core.utils.rootfs import RootfsCache
+from atoms_core.utils.progress import TerminalProgressSink
 from atoms_core.utils.distribution import AtomsDistributionsUtils
 from atoms_core.entities.image import AtomImage
+from atoms_core.entities.image_store import AtomsImageStore
 from atoms_core.exceptions.image import AtomsFailToDownloadImage
 
 
 class AtomsImageUtils:
+    # images path -> index of the images, see __get_index
+    __indexes = {}
+    __indexes_lock = threading.Lock()
+    # image path -> lock serializing its download
+    __download_locks = {}
+    __download_locks_lock = threading.Lock()
+
+    @staticmethod
+    def __get_download_lock(image_path: str) -> threading.Lock:
+        with AtomsImageUtils.__download_locks_lock:
+            return AtomsImageUtils.__download_locks.setdefault(
+                image_path, threading.Lock())
 
     @staticmethod
     def get_image(
@@ -33,40 +47,227 @@ class AtomsImageUtils:
         distribution: "AtomDistribution",
         architecture: str,
         release: str,
-        update_fn: callable
+        update_fn: callable,
+        sinks: list = None,
+        cancel_event: threading.Event = None,
+        rootfs_cache: RootfsCache = None,
+        unpack_to: str = None
     ) -> AtomImage:
-        remote = distribution.get_remote(architecture, release)
-        image_name = distribution.get_image_name(architecture, release)
+        """
+        Returns the image for the given release, downloading it if needed.
+        If rootfs_cache is given and the remote hash is known, a missing
+        image is extracted in the cache while it downloads, the extracted
+        tree is kept only if the downloaded image matches the hash.
+        If unpack_to is given instead, the image is always extracted there,
+        while it downloads if missing; the caller must remove it if this
+        raises, e.g. on a hash mismatch.
+        """
+        info = distribution.resolve(architecture, release, instance)
+        remote = info["remote"]
+        image_name = info["imageName"]
         image_path = os.path.join(instance.config.atoms_images, image_name)
-        remote_hash = distribution.read_remote_hash(architecture, release)
-        hash_type = distribution.remote_hash_type
+        remote_hash = info["hash"]
+        hash_type = info["hashType"]
 
-        if not os.path.exists(image_path):
+        # the terminal progress bar is opt-in, clients get their progress
+        # through the update_fn callback
+        sinks = list(sinks or [])
+        if "ATOMS_PRINT_PROGRESS" in os.environ:
+            sinks.append(TerminalProgressSink())
+
+        # an image with the same content may already be stored with
+        # another name, e.g. when the remote build directory rotates
+        store = AtomsImageStore(instance.config)
+        digest = None
+        if None not in [remote_hash, hash_type]:
+            digest = f"{hash_type}-{remote_hash}"
+            existing = store.find(digest)
+            if existing is not None:
+                image_name = existing
+                image_path = store.get_path(existing)
+
+        def download(tee: "io.BufferedIOBase" = None):
             if not DownloadUtils(instance, remote, image_path, update_fn, \
-                                 remote_hash, hash_type, image_name).download():
+                                 remote_hash, hash_type, image_name, \
+                                 sinks=sinks, cancel_event=cancel_event, \
+                                 tee=tee).download():
                 raise AtomsFailToDownloadImage(remote)
 
-        return AtomImage(image_name, image_path, distribution.root)
+        unpacked = False
+        if not os.path.exists(image_path):
+            # concurrent requests for the same image download it once
+            with AtomsImageUtils.__get_download_lock(image_path):
+                if not os.path.exists(image_path):
+                    streamed = AtomImage(
+                        image_name, image_path, distribution.root, digest)
+                    if unpack_to is not None:
+                        streamed.unpack_streaming(unpack_to, download)
+                        unpacked = True
+                    elif rootfs_cache is not None and digest is not None:
+                        rootfs_cache.ensure_streaming(streamed, download)
+                    else:
+                        download()
+
+        # without a remote hash, the digest computed when the image was
+        # first stored is reused
+        if digest is None and store.get(image_name) is not None:
+            digest = store.get(image_name)["digest"]
+
+        image = AtomImage(image_name, image_path, distribution.root, digest)
+        if unpack_to is not None and not unpacked:
+            image.unpack(unpack_to)
+
+        stored_name = store.add(
+            image, distribution.distribution_id, release, architecture)
+        if stored_name != image_name:
+            image = AtomImage(stored_name, store.get_path(stored_name),
+                              distribution.root, image.digest)
+
+        return image
+
+    @staticmethod
+    def __scan(images_path: str) -> dict:
+        """Returns the stat of each image file of the images path."""
+        stats = {}
+        with os.scandir(images_path) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") \
+                        or entry.name.endswith((".part", ".part.json")):
+                    continue
+                try:
+                    stats[entry.name] = entry.stat()
+                except FileNotFoundError:
+                    continue
+        return stats
+
+    @staticmethod
+    def __load_image(
+        store: AtomsImageStore, images_path: str, name: str,
+        stat: os.stat_result
+    ) -> dict:
+        info = store.get(name) or {}
+        image = AtomImage(
+            name, os.path.join(images_path, name),
+            digest=info.get("digest"),
+            distribution_id=info.get("distributionId"),
+            release=info.get("release"),
+            architecture=info.get("architecture"),
+            stat=stat
+        )
+        distribution = AtomsDistributionsUtils.get_distribution_by_image(image)
+        if image.distribution_id is None:
+            image.distribution_id = distribution.distribution_id
+
+        return {
+            "signature": (stat.st_mtime_ns, stat.st_size),
+            "image": image,
+            "distribution": distribution.name,
+        }
+
+    @staticmethod
+    def __build_index(entries: dict) -> dict:
+        images = []
+        by_name = {}
+        by_id = {}
+
+        for name in sorted(entries):
+            entry = entries[name]
+            image = entry["image"]
+            images.append(image)
+            by_name.setdefault(entry["distribution"], []).append(image)
+            by_id.setdefault(image.distribution_id, []).append(image)
+
+        return {
+            "signatures": {
+                name: entry["signature"] for name, entry in entries.items()
+            },
+            "entries": entries,
+            "images": images,
+            "by_name": by_name,
+            "by_id": by_id,
+        }
+
+    @staticmethod
+    def __get_index(config: "AtomsConfig") -> dict:
+        """
+        Returns the images of the images path, along with their grouping
+        by distribution name and id. The index is checked against the
+        mtime and size of each image file (the mtime of the images path
+        also changes with the image store index), only new or changed
+        images are loaded again.
+        """
+        images_path = config.atoms_images
+        stats = AtomsImageUtils.__scan(images_path)
+        signatures = {
+            name: (stat.st_mtime_ns, stat.st_size)
+            for name, stat in stats.items()
+        }
+
+        with AtomsImageUtils.__indexes_lock:
+            index = AtomsImageUtils.__indexes.get(images_path)
+            if index is not None and index["signatures"] == signatures:
+                return index
+            previous = index["entries"] if index is not None else {}
+
+        store = AtomsImageStore(config)
+        entries = {}
+        for name, stat in stats.items():
+            entry = previous.get(name)
+            if entry is None or entry["signature"] != signatures[name]:
+                entry = AtomsImageUtils.__load_image(
+                    store, images_path, name, stat)
+            entries[name] = entry
+
+        index = AtomsImageUtils.__build_index(entries)
+        with AtomsImageUtils.__indexes_lock:
+            AtomsImageUtils.__indexes[images_path] = index
+        return index
 
     @staticmethod
-    def get_image_list(config: "AtomsConfig") -> dict:
-        image_list = []
-        for image in os.listdir(config.atoms_images):
-            image_list.append(
-                AtomImage(image, os.path.join(config.atoms_images, image)))
-        image_list.sort(key=lambda x: x.name)
-
-        return image_list
-    
+    def update_image(config: "AtomsConfig", name: str) -> AtomImage:
+        """
+        Reload a single image of the index, e.g. on a change notified by
+        the inventory watcher, instead of checking the whole images path.
+        Returns the image, None if it does not exist anymore.
+        """
+        images_path = config.atoms_images
+        try:
+            stat = os.stat(os.path.join(images_path, name))
+        except FileNotFoundError:
+            stat = None
+
+        entry = None
+        if stat is not None:
+            entry = AtomsImageUtils.__load_image(
+                AtomsImageStore(config), images_path, name, stat)
+
+        with AtomsImageUtils.__indexes_lock:
+            index = AtomsImageUtils.__indexes.get(images_path)
+            if index is not None:
+                entries = dict(index["entries"])
+                if entry is None:
+                    entries.pop(name, None)
+                else:
+                    entries[name] = entry
+                AtomsImageUtils.__indexes[images_path] = \
+                    AtomsImageUtils.__build_index(entries)
+
+        return entry["image"] if entry is not None else None
+
+    @staticmethod
+    def get_image_list(config: "AtomsConfig") -> list:
+        return list(AtomsImageUtils.__get_index(config)["images"])
+
     @staticmethod
     def get_image_list_grouped(config: "AtomsConfig") -> dict:
-        image_list = AtomsImageUtils.get_image_list(config)
-        image_list_grouped = {}
-        for image in image_list:
-            _distribution = AtomsDistributionsUtils.get_distribution_by_image(
-                image).name
-            if _distribution not in image_list_grouped:
-                image_list_grouped[_distribution] = []
-            image_list_grouped[_distribution].append(image)
-
-        return image_list_grouped
+        return {
+            name: list(images) for name, images
+            in AtomsImageUtils.__get_index(config)["by_name"].items()
+        }
+
+    @staticmethod
+    def get_images_by_distribution(
+        config: "AtomsConfig", distribution_id: str
+    ) -> list:
+        return list(
+            AtomsImageUtils.__get_index(config)["by_id"].get(distribution_id, []))
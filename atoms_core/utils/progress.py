@@ -0,0 +1,144 @@
+# progress.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import threading
+
+from atoms_core.utils.file import FileUtils
+from atoms_core.models.progress import ProgressModel
+
+
+class ProgressReporter:
+    """
+    Coalesce the progress of a transfer before notifying the client. The
+    callback is executed on the main thread through the client bridge, at
+    most once per interval seconds or, if step is set, each time the
+    progress advances by step percent. The last update is always
+    delivered.
+
+    Sinks are plain callables receiving the same ProgressModel on the
+    calling thread, they can be used for things like printing to a
+    terminal (see TerminalProgressSink).
+    """
+
+    def __init__(
+        self,
+        instance: "AtomsInstance",
+        name: str,
+        func: callable = None,
+        sinks: list = None,
+        interval: float = 0.25,
+        step: float = None
+    ):
+        self.__instance = instance
+        self.__name = name
+        self.__func = func
+        self.__sinks = sinks or []
+        self.__interval = interval
+        self.__step = step
+        self.__lock = threading.Lock()
+        self.__total = 0
+        self.__downloaded = 0
+        self.__initial = 0
+        self.__rate = 0.0
+        self.__start_time = time.monotonic()
+        self.__last_emit = None
+        self.__last_fraction = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.__func is not None or len(self.__sinks) > 0
+
+    def start(self, total: int, downloaded: int = 0):
+        """
+        (Re)start tracking a transfer of total bytes. downloaded is the
+        amount already available (e.g. a resumed download), it is not
+        accounted in the transfer rate.
+        """
+        with self.__lock:
+            self.__total = total
+            self.__downloaded = downloaded
+            self.__initial = downloaded
+            self.__rate = 0.0
+            self.__start_time = time.monotonic()
+            self.__last_emit = None
+            self.__last_fraction = 0.0
+
+    def update(self, size: int):
+        """Account size more bytes, notifying if an update is due."""
+        with self.__lock:
+            self.__downloaded += size
+
+            if not self.enabled:
+                return
+
+            now = time.monotonic()
+            due = self.__last_emit is None \
+                or now - self.__last_emit >= self.__interval
+
+            if self.__step is not None and self.__total:
+                fraction = self.__downloaded / self.__total
+                due = due or (fraction - self.__last_fraction) * 100 >= self.__step
+
+            if due:
+                self.__emit(now)
+
+    def finish(self):
+        """Deliver the final update."""
+        with self.__lock:
+            if self.enabled:
+                self.__emit(time.monotonic(), finished=True)
+
+    def __emit(self, now: float, finished: bool = False):
+        elapsed = now - self.__start_time
+        if elapsed > 0:
+            self.__rate = (self.__downloaded - self.__initial) / elapsed
+
+        if self.__total:
+            self.__last_fraction = self.__downloaded / self.__total
+        self.__last_emit = now
+
+        progress = ProgressModel(
+            self.__name,
+            self.__downloaded,
+            self.__total,
+            self.__rate,
+            finished
+        )
+
+        for sink in self.__sinks:
+            sink(progress)
+
+        if self.__func:
+            self.__instance.client_bridge.exec_on_main(self.__func, progress)
+
+
+class TerminalProgressSink:
+    """Print a progress bar to the terminal."""
+
+    def __call__(self, progress: ProgressModel):
+        percent = progress.percent or 0
+        done_str = FileUtils.get_human_size(progress.downloaded)
+        total_str = FileUtils.get_human_size(progress.total)
+        speed_str = FileUtils.get_human_size(progress.rate)
+        c_close, c_complete, c_incomplete = "\033[0m", "\033[92m", "\033[90m"
+        print(
+            f"\r{c_incomplete if percent < 100 else c_complete}{progress.name} ({percent}%) \
+{'━' * int(percent / 2)} ({done_str}/{total_str} - {speed_str}/s)",
+            end=""
+        )
+        if progress.finished:
+            print(f"{c_close}\n")
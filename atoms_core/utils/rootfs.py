@@ -0,0 +1,195 @@
+# rootfs.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import glob
+import uuid
+import orjson
+import shutil
+import logging
+import threading
+
+from atoms_core.utils.file import FileUtils
+
+
+logger = logging.getLogger("atoms.utils.rootfs")
+
+
+class RootfsCache:
+    """
+    A content addressed cache of pristine extracted images, keyed by the
+    image digest. Each image is extracted once, new chroots are cloned
+    from the cached tree instead of decompressing the image again.
+
+    Without reflink support, a cached tree would be a full copy of each
+    atom cloned from it, so the cache is then only used for the bases of
+    layered atoms: other atoms are extracted directly in their chroot,
+    while the image downloads when it is missing, see Atom.new.
+    """
+
+    # paths copied in the upper layer of layered atoms, every other path
+    # is read from the shared base
+    mutable_paths = [
+        "etc", "root", "home", "var", "opt", "srv", "usr/local",
+    ]
+
+    __locks = {}
+    __locks_lock = threading.Lock()
+
+    def __init__(self, config: "AtomsConfig"):
+        self.__path = config.rootfs_cache_path
+        self.__atoms_path = config.atoms_path
+
+    @property
+    def path(self) -> str:
+        return self.__path
+
+    def get_path(self, image: "AtomImage") -> str:
+        return os.path.join(self.__path, image.digest)
+
+    def has(self, image: "AtomImage") -> bool:
+        return os.path.isdir(self.get_path(image))
+
+    @property
+    def supports_reflink(self) -> bool:
+        os.makedirs(self.__path, exist_ok=True)
+        return FileUtils.supports_reflink(self.__path)
+
+    def get_layers(self) -> set:
+        """
+        Returns the digests used as base by layered atoms, read from the
+        atoms themselves since they cannot run without it.
+        """
+        layers = set()
+        pattern = os.path.join(self.__atoms_path, "*.atom", "atom.json")
+        for path in glob.glob(pattern):
+            try:
+                with open(path, "rb") as f:
+                    layers.update(orjson.loads(f.read()).get("layers", []))
+            except (OSError, orjson.JSONDecodeError):
+                continue
+        return layers
+
+    def __get_lock(self, digest: str) -> threading.Lock:
+        with RootfsCache.__locks_lock:
+            return RootfsCache.__locks.setdefault(digest, threading.Lock())
+
+    def ensure(self, image: "AtomImage") -> str:
+        """
+        Return the cached tree for the image, extracting it if missing.
+        Extraction happens in a temporary directory which is renamed in
+        place once complete, so a partial tree is never served.
+        """
+        path = self.get_path(image)
+        if os.path.isdir(path):
+            return path
+
+        with self.__get_lock(image.digest):
+            if os.path.isdir(path):
+                return path
+
+            os.makedirs(self.__path, exist_ok=True)
+            tmp_path = "{}.tmp-{}".format(path, uuid.uuid4().hex)
+            logger.info(f"Caching rootfs for {image.name} in {path}")
+
+            try:
+                image.unpack(tmp_path)
+                os.rename(tmp_path, path)
+            except OSError:
+                # another process may have cached the same image meanwhile
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                if not os.path.isdir(path):
+                    raise
+            except BaseException:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                raise
+
+        return path
+
+    def ensure_streaming(self, image: "AtomImage", download: callable) -> str:
+        """
+        Like ensure, but the image is extracted while it is downloaded
+        instead of once it is on disk. download(stream) must write the
+        whole archive to stream and raise if its digest does not match,
+        the extracted tree is only committed if it returns, otherwise it
+        is removed and the error raised again.
+        """
+        path = self.get_path(image)
+
+        with self.__get_lock(image.digest):
+            if os.path.isdir(path):
+                # the tree is cached, only the archive may be missing
+                if not os.path.exists(image.path):
+                    download(None)
+                return path
+
+            os.makedirs(self.__path, exist_ok=True)
+            tmp_path = "{}.tmp-{}".format(path, uuid.uuid4().hex)
+            logger.info(f"Caching rootfs for {image.name} while downloading")
+
+            try:
+                image.unpack_streaming(tmp_path, download)
+                os.rename(tmp_path, path)
+            except BaseException:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                raise
+
+        return path
+
+    def clone_to(self, image: "AtomImage", destination: str) -> str:
+        """
+        Populate destination with the cached tree of the image, returns
+        the method used, see FileUtils.clone_tree, or "extract" when the
+        image was extracted directly since reflinks are not supported.
+        A copied tree is dropped unless it is the base of layered atoms.
+        """
+        if not self.has(image) and not self.supports_reflink:
+            image.unpack(destination)
+            logger.info(f"Extracted {image.name}, reflinks not supported")
+            return "extract"
+
+        method = FileUtils.clone_tree(self.ensure(image), destination)
+        logger.info(f"Cloned rootfs of {image.name} ({method})")
+
+        if method == "copy" and image.digest not in self.get_layers():
+            with self.__get_lock(image.digest):
+                self.remove(image.digest)
+
+        return method
+
+    def prepare_upper(self, image: "AtomImage", upper_path: str):
+        """
+        Populate the upper layer of a layered atom with its own copy of
+        the mutable paths of the cached tree.
+        """
+        base_path = self.ensure(image)
+        os.makedirs(upper_path, exist_ok=True)
+
+        for path in self.mutable_paths:
+            source = os.path.join(base_path, path)
+            if os.path.isdir(source) and not os.path.islink(source):
+                FileUtils.clone_tree(source, os.path.join(upper_path, path))
+
+    def remove(self, digest: str):
+        shutil.rmtree(os.path.join(self.__path, digest), ignore_errors=True)
+
+    def list(self) -> list:
+        if not os.path.isdir(self.__path):
+            return []
+        return [
+            entry for entry in os.listdir(self.__path)
+            if ".tmp-" not in entry
+        ]
@@ -16,13 +16,23 @@
 
 import os
 import shutil
+import orjson
+import logging
 import datetime
 
+from atoms_core.utils.cache import TTLCache
 from atoms_core.utils.command import CommandUtils
-from atoms_core.exceptions.podman import AtomsFailToCreateContainer
+from atoms_core.utils.container import ContainerUtils
+from atoms_core.wrappers.podman_api import PodmanApiClient
+from atoms_core.exceptions.podman import AtomsFailToCreateContainer, AtomsPodmanApiError
+
+
+logger = logging.getLogger("atoms.wrappers.distrobox")
 
 
 class DistroboxWrapper:
+    # short lived, so the calls of a single refresh share one listing
+    containers_cache = TTLCache(ttl=2)
 
     def __init__(self):
         self.__binary_path = self.__find_binary_path()
@@ -30,7 +40,103 @@ class DistroboxWrapper:
     def __find_binary_path(self) -> str:
         return CommandUtils.which("distrobox", allow_flatpak_host=True)
 
-    def get_containers(self) -> list:
+    def get_containers(self, name: str = None) -> dict:
+        """
+        Returns the distrobox containers (only the one called name if
+        given) with their image, name, creation date and state. They are
+        listed through the Podman API when reachable and distrobox uses
+        podman, otherwise with a single JSON listing of the container
+        engine, parsing 'distrobox list' as last resort. Results are
+        cached for a couple of seconds.
+        """
+        return self.containers_cache.get_or_set(
+            name, lambda: self.__list_containers(name))
+
+    def __list_containers(self, name: str = None) -> dict:
+        engine, engine_path = self.__find_engine()
+
+        # the podman socket can be there while distrobox uses docker
+        api = PodmanApiClient.get_default()
+        if engine in (None, "podman") and api.is_supported:
+            try:
+                return self.__get_containers_from_api(api, name)
+            except AtomsPodmanApiError as e:
+                logger.debug(f"Podman API not available, using the CLI: {e}")
+
+        if engine_path is not None:
+            try:
+                return self.__get_containers_from_engine(
+                    engine, engine_path, name)
+            except (orjson.JSONDecodeError, KeyError, ValueError) as e:
+                logger.debug(f"Cannot read the {engine} listing: {e}")
+
+        containers = self.__get_containers_from_cli()
+        if name is not None:
+            containers = {
+                _id: _container for _id, _container in containers.items()
+                if _container["name"] == name
+            }
+        return containers
+
+    @staticmethod
+    def __find_engine() -> tuple:
+        # distrobox itself can be told which engine to use
+        engines = ["podman", "docker"]
+        if os.environ.get("DBX_CONTAINER_MANAGER") in engines:
+            engines = [os.environ["DBX_CONTAINER_MANAGER"]]
+
+        paths = CommandUtils.which_many(engines, allow_flatpak_host=True)
+        for engine in engines:
+            if paths[engine] is not None:
+                return engine, paths[engine]
+        return None, None
+
+    def __get_containers_from_api(
+        self, api: PodmanApiClient, name: str = None
+    ) -> dict:
+        filters = {"label": ["manager=distrobox"]}
+        if name is not None:
+            filters["name"] = [f"^{name}$"]
+
+        containers = {}
+        for entry in api.list_containers(filters):
+            container_id, info = ContainerUtils.from_podman(entry)
+            containers[container_id] = info
+        return containers
+
+    def __get_containers_from_engine(
+        self, engine: str, engine_path: str, name: str = None
+    ) -> dict:
+        command = [
+            engine_path, "ps", "-a", "--no-trunc",
+            "--filter", "label=manager=distrobox",
+        ]
+        if name is not None:
+            command += ["--filter", f"name=^{name}$"]
+
+        # podman prints a JSON array, docker a JSON object per line
+        if engine == "podman":
+            command += ["--format", "json"]
+        else:
+            command += ["--format", "{{json .}}"]
+
+        output = CommandUtils.run_command(
+            command, output=True, allow_flatpak_host=True).strip()
+
+        if engine == "podman":
+            entries = orjson.loads(output)
+        else:
+            entries = [
+                orjson.loads(line) for line in output.splitlines() if line
+            ]
+
+        containers = {}
+        for entry in entries:
+            container_id, info = ContainerUtils.from_podman(entry)
+            containers[container_id] = info
+        return containers
+
+    def __get_containers_from_cli(self) -> dict:
         containers = {}
         command = [
             self.__binary_path,
@@ -82,11 +188,13 @@ class DistroboxWrapper:
     def destroy_container(self, container_id: str, container_name: str):
         self.stop_container(container_id)
         command = [self.__binary_path, "rm", "-f", container_name]
-        CommandUtils.run_command(command, allow_flatpak_host=True)
+        CommandUtils.run_command(command, wait=True, allow_flatpak_host=True)
+        self.containers_cache.invalidate()
 
     def stop_container(self, container_id: str):
         command = [self.__binary_path, "stop", "-f", container_id]
-        CommandUtils.run_command(command, allow_flatpak_host=True)
+        CommandUtils.run_command(command, wait=True, allow_flatpak_host=True)
+        self.containers_cache.invalidate()
 
     def new_container(self, name: str, image: str) -> str:
         command = [
@@ -101,7 +209,8 @@ class DistroboxWrapper:
             # TODO: improve error message
             raise AtomsFailToCreateContainer(str(e))
 
-        _containers = self.get_containers()
+        self.containers_cache.invalidate()
+        _containers = self.get_containers(name)
         for _id, _container in _containers.items():
             if _container["name"] == name:
                 return _id
@@ -0,0 +1,71 @@
+# fuse_overlayfs.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import logging
+import subprocess
+
+from atoms_core.utils.command import CommandUtils
+
+
+logger = logging.getLogger("atoms.wrappers.fuse_overlayfs")
+
+
+class FuseOverlayfsWrapper:
+
+    def __init__(self):
+        self.__binary_path = self.__find_binary_path("fuse-overlayfs")
+        self.__fusermount_path = self.__find_binary_path("fusermount3") \
+            or self.__find_binary_path("fusermount")
+
+    def __find_binary_path(self, binary: str) -> str:
+        return CommandUtils.which(binary)
+
+    @property
+    def is_supported(self) -> bool:
+        # the flatpak sandbox has no access to /dev/fuse
+        return self.__binary_path is not None \
+            and self.__fusermount_path is not None \
+            and os.path.exists("/dev/fuse") \
+            and not CommandUtils.is_flatpak()
+
+    def get_mount_command(
+        self, lower_paths: list, upper_path: str, work_path: str,
+        merged_path: str, command: list
+    ) -> list:
+        """
+        Returns a command which mounts the overlay in merged_path, unless
+        it is already mounted by another session, and then runs command.
+        The overlay stays mounted until unmount is called.
+        """
+        script = 'mountpoint -q "$4" || "$0" -o lowerdir="$1",upperdir="$2",workdir="$3" "$4" || exit 1; ' \
+            'shift 4; exec "$@"'
+        return [
+            "sh", "-c", script, self.__binary_path,
+            ":".join(lower_paths), upper_path, work_path, merged_path,
+        ] + command
+
+    def is_mounted(self, merged_path: str) -> bool:
+        return os.path.ismount(merged_path)
+
+    def unmount(self, merged_path: str):
+        if not self.is_mounted(merged_path):
+            return
+
+        try:
+            subprocess.check_call([self.__fusermount_path, "-u", merged_path])
+        except subprocess.CalledProcessError:
+            logger.warning(f"Failed to unmount {merged_path}")
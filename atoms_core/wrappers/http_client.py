@@ -0,0 +1,92 @@
+# http_client.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class HttpClient:
+    """
+    Pooled HTTP client shared by every remote call of an AtomsInstance
+    (remote listings, hash files and image downloads), so requests to the
+    same mirror reuse kept-alive connections instead of opening a new
+    TCP+TLS session each time.
+
+    :param pool_size: Maximum number of connections kept per host, it
+           should be at least the number of download segments.
+    :param timeout: Connect and read timeouts in seconds, used when a
+           request does not set its own.
+    :param retries: How many times a failed connection or a 429/5xx
+           response is retried.
+    :param backoff_factor: Retries wait backoff_factor * 2^(retry - 1)
+           seconds.
+    """
+    __default: "HttpClient" = None
+    __default_lock = threading.Lock()
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        timeout: tuple = (10, 60),
+        retries: int = 3,
+        backoff_factor: float = 0.5
+    ):
+        self.timeout = timeout
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["HEAD", "GET"]),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry
+        )
+
+        self.__session = requests.Session()
+        self.__session.mount("http://", adapter)
+        self.__session.mount("https://", adapter)
+
+    @classmethod
+    def get_default(cls) -> "HttpClient":
+        """
+        Returns a process wide client, used by the components which are
+        not bound to an AtomsInstance.
+        """
+        with cls.__default_lock:
+            if cls.__default is None:
+                cls.__default = cls()
+            return cls.__default
+
+    def request(self, method: str, url: str, **kwargs) -> "requests.Response":
+        kwargs.setdefault("timeout", self.timeout)
+        return self.__session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> "requests.Response":
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> "requests.Response":
+        kwargs.setdefault("allow_redirects", True)
+        return self.request("HEAD", url, **kwargs)
+
+    def close(self):
+        self.__session.close()
@@ -0,0 +1,122 @@
+# inotify.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+
+
+logger = logging.getLogger("atoms.wrappers.inotify")
+
+# from sys/inotify.h
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWrapper:
+    """
+    Minimal inotify binding through ctypes, only available on Linux with
+    a libc exposing inotify_init1.
+    """
+
+    def __init__(self):
+        self.__libc = self.__load_libc()
+        self.__fd = None
+
+    @staticmethod
+    def __load_libc():
+        try:
+            libc = ctypes.CDLL(
+                ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            libc.inotify_init1
+            libc.inotify_add_watch
+        except (OSError, AttributeError):
+            return None
+
+        libc.inotify_add_watch.argtypes = [
+            ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+
+    @property
+    def is_supported(self) -> bool:
+        return self.__libc is not None
+
+    def open(self):
+        fd = self.__libc.inotify_init1(IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.__fd = fd
+
+    def close(self):
+        if self.__fd is not None:
+            os.close(self.__fd)
+            self.__fd = None
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self.__libc.inotify_add_watch(
+            self.__fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        # the kernel drops the watch itself when the path is removed
+        self.__libc.inotify_rm_watch(self.__fd, wd)
+
+    def read_events(self, timeout: float = None) -> list:
+        """
+        Returns the pending events as (wd, mask, cookie, name) tuples,
+        waiting up to timeout seconds for the first one.
+        """
+        try:
+            ready, _, _ = select.select([self.__fd], [], [], timeout)
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                return []
+            raise
+
+        if not ready:
+            return []
+
+        buffer = os.read(self.__fd, 64 * 1024)
+        events = []
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = buffer[offset:offset + length].rstrip(b"\0")
+            offset += length
+            events.append((wd, mask, cookie, os.fsdecode(name)))
+        return events
@@ -16,9 +16,15 @@
 
 import os
 import shutil
+import logging
 
 from atoms_core.utils.command import CommandUtils
-from atoms_core.exceptions.podman import AtomsFailToCreateContainer
+from atoms_core.utils.container import ContainerUtils
+from atoms_core.wrappers.podman_api import PodmanApiClient
+from atoms_core.exceptions.podman import AtomsFailToCreateContainer, AtomsPodmanApiError
+
+
+logger = logging.getLogger("atoms.wrappers.podman")
 
 
 class PodmanWrapper:
@@ -29,7 +35,22 @@ class PodmanWrapper:
     def __find_binary_path(self) -> str:
         return CommandUtils.which("podman", allow_flatpak_host=True)
 
-    def get_containers(self) -> list:
+    def get_containers(self) -> dict:
+        api = PodmanApiClient.get_default()
+        if api.is_supported:
+            try:
+                containers = {}
+                for entry in api.list_containers():
+                    container_id, info = ContainerUtils.from_podman(entry)
+                    containers[container_id] = {
+                        "image": info["image"],
+                        "names": info["name"],
+                        "creation_date": info["creation_date"],
+                    }
+                return containers
+            except AtomsPodmanApiError as e:
+                logger.debug(f"Podman API not available, using the CLI: {e}")
+
         containers = {}
         command = [
             self.__binary_path,
@@ -0,0 +1,192 @@
+# podman_api.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import queue
+import socket
+import orjson
+import logging
+import threading
+import http.client
+from urllib.parse import urlencode
+
+from atoms_core.utils.command import CommandUtils
+from atoms_core.exceptions.podman import AtomsPodmanApiError
+
+
+logger = logging.getLogger("atoms.wrappers.podman_api")
+
+API_VERSION = "v4.0.0"
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class PodmanApiClient:
+    """
+    Client for the Podman REST API (libpod) exposed on a Unix socket,
+    keeping a small pool of kept-alive connections. The socket is the one
+    in CONTAINER_HOST when set to a unix:// URL, otherwise the rootless
+    one of the current user. It is not reachable from a flatpak sandbox
+    without access to xdg-run/podman, callers fall back to the CLI.
+    """
+    __default: "PodmanApiClient" = None
+    __default_lock = threading.Lock()
+
+    def __init__(
+        self, socket_path: str = None, pool_size: int = 4, timeout: float = 5
+    ):
+        if socket_path is None:
+            socket_path = self.find_socket_path()
+
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.__pool = queue.LifoQueue(maxsize=pool_size)
+
+    @classmethod
+    def get_default(cls) -> "PodmanApiClient":
+        with cls.__default_lock:
+            if cls.__default is None:
+                cls.__default = cls()
+            return cls.__default
+
+    @staticmethod
+    def find_socket_path() -> str:
+        container_host = os.environ.get("CONTAINER_HOST", "")
+        if container_host.startswith("unix://"):
+            return container_host[len("unix://"):]
+
+        runtime_dir = os.environ.get(
+            "XDG_RUNTIME_DIR", f"/run/user/{os.getuid()}")
+        return os.path.join(runtime_dir, "podman", "podman.sock")
+
+    @property
+    def is_supported(self) -> bool:
+        return self.socket_path is not None \
+            and os.path.exists(self.socket_path) \
+            and not CommandUtils.is_flatpak() \
+            and "ATOMS_NO_PODMAN_API" not in os.environ
+
+    def __get_connection(self) -> UnixHTTPConnection:
+        try:
+            return self.__pool.get_nowait()
+        except queue.Empty:
+            return UnixHTTPConnection(self.socket_path, self.timeout)
+
+    def __release_connection(self, connection: UnixHTTPConnection):
+        try:
+            self.__pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def request(
+        self, method: str, path: str, params: dict = None, body: dict = None
+    ):
+        """
+        Perform a request against the libpod API and return the decoded
+        JSON response, None for empty responses.
+        """
+        url = f"/{API_VERSION}/libpod{path}"
+        if params:
+            url += "?" + urlencode(params)
+
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = orjson.dumps(body)
+            headers["Content-Type"] = "application/json"
+
+        # a pooled connection may have been closed by the server meanwhile,
+        # in that case the request is retried once on a new connection
+        for attempt in range(2):
+            connection = self.__get_connection()
+            try:
+                connection.request(method, url, body=payload, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError,
+                    ConnectionResetError) as e:
+                connection.close()
+                if attempt == 0:
+                    continue
+                raise AtomsPodmanApiError(path, str(e))
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                raise AtomsPodmanApiError(path, str(e))
+
+            if response.will_close:
+                connection.close()
+            else:
+                self.__release_connection(connection)
+            break
+
+        if response.status >= 400:
+            try:
+                message = orjson.loads(data).get("message", data)
+            except (orjson.JSONDecodeError, AttributeError):
+                message = data.decode("utf-8", "replace")
+            raise AtomsPodmanApiError(path, f"{response.status} {message}")
+
+        if not data:
+            return None
+        if "json" not in (response.getheader("Content-Type") or ""):
+            return data.decode("utf-8", "replace")
+        return orjson.loads(data)
+
+    def ping(self) -> bool:
+        try:
+            self.request("GET", "/_ping")
+        except AtomsPodmanApiError:
+            return False
+        return True
+
+    def list_containers(self, filters: dict = None, all: bool = True) -> list:
+        """
+        List the containers, filters are podman filters, e.g.
+        {"label": ["manager=distrobox"], "name": ["box"]}.
+        """
+        params = {"all": "true" if all else "false"}
+        if filters:
+            params["filters"] = orjson.dumps(filters).decode("utf-8")
+        return self.request("GET", "/containers/json", params) or []
+
+    def stop_container(self, container_id: str, timeout: int = 10):
+        self.request("POST", f"/containers/{container_id}/stop",
+                     {"timeout": timeout})
+
+    def kill_container(self, container_id: str):
+        self.request("POST", f"/containers/{container_id}/kill")
+
+    def close(self):
+        while True:
+            try:
+                self.__pool.get_nowait().close()
+            except queue.Empty:
+                return
@@ -24,7 +24,9 @@ from pathlib import Path
 
 from atoms_core.utils.command import CommandUtils
 from atoms_core.exceptions.common import AtomsNoBinaryFound
+from atoms_core.exceptions.atom import AtomsLayersNotSupported
 from atoms_core.params.paths import AtomsPaths
+from atoms_core.wrappers.fuse_overlayfs import FuseOverlayfsWrapper
 
 
 logger = logging.getLogger("atoms.wrappers.proot")
@@ -167,6 +169,36 @@ class ProotWrapper:
         command = _command + command
         return CommandUtils.get_valid_command(command, allow_flatpak_host=high_privileges)
 
+    def get_proot_command_for_layers(
+        self,
+        lower_paths: list,
+        upper_path: str,
+        work_path: str,
+        merged_path: str,
+        command: list = None,
+        working_directory: str = None,
+        bind_mounts: list = None,
+    ) -> list:
+        """
+        Returns the proot command for a layered atom, the layers are merged
+        with fuse-overlayfs. proot can not bind the shared base read-only,
+        so without fuse-overlayfs AtomsLayersNotSupported is raised rather
+        than letting the atom write into the base.
+        """
+        if bind_mounts is None:
+            bind_mounts = []
+
+        overlay = FuseOverlayfsWrapper()
+        if not overlay.is_supported:
+            raise AtomsLayersNotSupported(merged_path)
+
+        os.makedirs(work_path, exist_ok=True)
+        os.makedirs(merged_path, exist_ok=True)
+        _command = self.get_proot_command_for_chroot(
+            merged_path, command, working_directory, bind_mounts)
+        return overlay.get_mount_command(
+            lower_paths, upper_path, work_path, merged_path, _command)
+
     def install_locally(self):
         if not os.path.exists(self.__binary_path):
             return
@@ -174,6 +206,7 @@ class ProotWrapper:
         try:
             shutil.copyfile(self.__binary_path, self.proot_local_path)
             os.chmod(self.proot_local_path, 0o755)
+            CommandUtils.invalidate_which("proot")
         except Exception as e:
             logging.debug(e)
     
@@ -0,0 +1,124 @@
+# download.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compare the CPU cost of streaming a download with the old fixed 1 KiB
+iter_content blocks against the adaptive ChunkReader. A local HTTP server
+is spawned in a separate process, so only the client side is measured.
+
+Usage: python benchmarks/download.py [--size MiB] [--runs N]
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import resource
+import tempfile
+import subprocess
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from atoms_core.utils.download import ChunkReader
+from atoms_core.utils.hash import HashUtils
+
+
+def cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def wait_for_port(port: int, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.05)
+    raise RuntimeError("HTTP server did not start")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def legacy_stream(response: "requests.Response", file, hasher):
+    for data in response.iter_content(1024):
+        file.write(data)
+        hasher.update(data)
+
+
+def adaptive_stream(response: "requests.Response", file, hasher):
+    for data in ChunkReader(response):
+        file.write(data)
+        hasher.update(data)
+
+
+def run(url: str, destination: str, stream_fn: callable) -> tuple:
+    hasher = HashUtils.get_hasher("sha256")
+    start_cpu, start_wall = cpu_time(), time.monotonic()
+
+    with open(destination, "wb") as file:
+        response = requests.get(url, stream=True)
+        response.raise_for_status()
+        stream_fn(response, file, hasher)
+
+    return cpu_time() - start_cpu, time.monotonic() - start_wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--size", type=int, default=512, help="payload size in MiB")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        payload = os.path.join(tmp, "rootfs.tar.xz")
+        with open(payload, "wb") as f:
+            chunk = os.urandom(1024 * 1024)
+            for _ in range(args.size):
+                f.write(chunk)
+
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "http.server", str(port),
+             "--bind", "127.0.0.1", "--directory", tmp],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_for_port(port)
+            url = f"http://127.0.0.1:{port}/rootfs.tar.xz"
+            destination = os.path.join(tmp, "download")
+            gigabytes = args.size / 1024
+
+            print(f"{'mode':<10} {'cpu s/GB':>10} {'wall s':>8} {'MiB/s':>8}")
+            for name, stream_fn in [("1KiB", legacy_stream), ("adaptive", adaptive_stream)]:
+                results = [run(url, destination, stream_fn) for _ in range(args.runs)]
+                cpu = min(result[0] for result in results)
+                wall = min(result[1] for result in results)
+                print(f"{name:<10} {cpu / gigabytes:>10.2f} {wall:>8.2f} {args.size / wall:>8.1f}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
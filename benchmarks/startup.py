@@ -0,0 +1,218 @@
+# startup.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure the startup cost of atoms_core without network: the cold import
+of atoms_core.atoms and the AtomsBackend construction, split in phases,
+with 10, 100 and 1000 synthetic atoms and stub distrobox/proot binaries
+on PATH. Every run happens in fresh interpreters, one per import phase,
+so each import is measured cold.
+
+Usage: python benchmarks/startup.py [--atoms 10 100 1000] [--runs N]
+           [--baseline FILE] [--update-baseline] [--tolerance 0.25]
+
+The benchmark exits with status 1 if a phase got slower than its
+baseline by more than the tolerance, or if there is no baseline. The
+committed startup-baseline.json was measured on a developer machine,
+regenerate it with --update-baseline when comparing on another one.
+"""
+
+import os
+import sys
+import json
+import stat
+import time
+import uuid
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "startup-baseline.json")
+
+# timings under this many seconds are noise, not regressions
+ABSOLUTE_SLACK = 0.002
+
+STUB_DISTROBOX = """#!/bin/sh
+if [ "$1" = "list" ]; then
+    echo "ID | NAME | STATUS | IMAGE"
+    echo "0123456789ab | box | Up 2 hours | registry.fedoraproject.org/fedora-toolbox:37"
+fi
+"""
+
+STUB_PROOT = """#!/bin/sh
+exit 0
+"""
+
+# import phases, each measured in its own interpreter
+IMPORT_PHASES = {
+    "import_distributions": "atoms_core.utils.distribution",
+    "import_atoms": "atoms_core.atoms",
+}
+
+
+def make_tree(tmp: str, atoms: int) -> dict:
+    """Create the data home with the synthetic atoms and the stubs."""
+    data_home = os.path.join(tmp, "data")
+    atoms_path = os.path.join(data_home, "atoms", "atoms")
+    os.makedirs(atoms_path)
+    os.makedirs(os.path.join(data_home, "atoms", "images"))
+
+    for i in range(atoms):
+        relative_path = f"{uuid.uuid4()}.atom"
+        os.makedirs(os.path.join(atoms_path, relative_path, "chroot"))
+        with open(os.path.join(atoms_path, relative_path, "atom.json"), "w") as f:
+            json.dump({
+                "name": f"atom-{i}",
+                "distributionId": "fedora",
+                "relativePath": relative_path,
+                "creationDate": "2022-11-01T10:00:00.000000",
+                "updateDate": "2022-11-01T10:00:00.000000",
+            }, f)
+
+    bin_path = os.path.join(tmp, "bin")
+    os.makedirs(bin_path)
+    for name, script in [("distrobox", STUB_DISTROBOX), ("proot", STUB_PROOT)]:
+        path = os.path.join(bin_path, name)
+        with open(path, "w") as f:
+            f.write(script)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+    env = dict(os.environ)
+    env["XDG_DATA_HOME"] = data_home
+    env["PATH"] = bin_path + os.pathsep + env.get("PATH", "")
+    env.pop("FLATPAK_ID", None)
+    env.pop("DEV_BASH", None)
+    return env
+
+
+def child(phase: str):
+    """
+    Runs in a fresh interpreter, prints the timings as JSON: of a single
+    import phase, or of the runtime phases once everything is imported.
+    """
+    sys.path.insert(0, ROOT)
+    timings = {}
+
+    def measure(name: str, fn: callable):
+        start = time.perf_counter()
+        result = fn()
+        timings[name] = time.perf_counter() - start
+        return result
+
+    if phase in IMPORT_PHASES:
+        measure(phase, lambda: __import__(IMPORT_PHASES[phase]))
+        print(json.dumps(timings))
+        return
+
+    from atoms_core.atoms import AtomsBackend
+    from atoms_core.entities.config import AtomsConfig
+    from atoms_core.entities.instance import AtomsInstance
+    from atoms_core.entities.registry import AtomsRegistry
+    from atoms_core.utils.distribution import AtomsDistributionsUtils
+    from atoms_core.wrappers.client_bridge import ClientBridge
+    from atoms_core.wrappers.distrobox import DistroboxWrapper
+
+    measure("distributions", AtomsDistributionsUtils.get_distributions)
+    config = measure("config_load", AtomsConfig)
+    instance = AtomsInstance(config, ClientBridge())
+    measure("atom_scan_cold", lambda: AtomsRegistry(config).get_atoms(instance))
+    measure("atom_scan_warm", lambda: AtomsRegistry(config).get_atoms(instance))
+    measure("distrobox_discovery", lambda: DistroboxWrapper().get_containers())
+    backend = measure("backend_init", AtomsBackend)
+    measure("backend_atoms", lambda: backend.atoms)
+
+    print(json.dumps(timings))
+
+
+def run(env: dict) -> dict:
+    timings = {}
+    for phase in list(IMPORT_PHASES) + ["runtime"]:
+        output = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), "--child", phase],
+            env=env)
+        timings.update(json.loads(output))
+    return timings
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for atoms, timings in results.items():
+        for phase, value in timings.items():
+            reference = baseline.get(atoms, {}).get(phase)
+            if reference is None:
+                continue
+            if value > reference * (1 + tolerance) + ABSOLUTE_SLACK:
+                regressions.append((atoms, phase, reference, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--atoms", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    results = {}
+    for atoms in args.atoms:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = make_tree(tmp, atoms)
+            runs = [run(env) for _ in range(args.runs)]
+        # the best run is the least disturbed by the rest of the system
+        results[str(atoms)] = {
+            phase: min(timings[phase] for timings in runs)
+            for phase in runs[0]
+        }
+
+    phases = list(next(iter(results.values())))
+    print(f"{'phase':<22}" + "".join(f"{atoms + ' atoms':>14}" for atoms in results))
+    for phase in phases:
+        print(f"{phase:<22}" + "".join(
+            f"{results[atoms][phase] * 1000:>12.2f}ms" for atoms in results))
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}, run with --update-baseline")
+        sys.exit(1)
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+
+    if regressions:
+        print("\nRegressions:")
+        for atoms, phase, reference, value in regressions:
+            print(f"  {phase} with {atoms} atoms: "
+                  f"{reference * 1000:.2f}ms -> {value * 1000:.2f}ms")
+        sys.exit(1)
+
+    print("\nNo regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# unpack.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Unpack synthetic root filesystem tarballs of different sizes and member
+counts, comparing the previous getmembers() + extractall() approach with
+the single pass ArchiveUtils.extract. Reports wall time and throughput
+(uncompressed MB per second).
+
+Usage: python benchmarks/unpack.py [--compression xz|gz|zst] [--runs N]
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import shutil
+import tarfile
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from atoms_core.utils.archive import ArchiveUtils
+
+
+# name, number of files, size of each file
+SCENARIOS = [
+    ("many-small", 20000, 4 * 1024),
+    ("mixed", 5000, 64 * 1024),
+    ("few-large", 64, 8 * 1024 * 1024),
+]
+
+
+def make_payload(size: int, rnd: random.Random) -> bytes:
+    # half random, half repeated, to get a realistic compression ratio
+    half = size // 2
+    return rnd.randbytes(half) + b"\0" * (size - half)
+
+
+def make_tarball(path: str, files: int, size: int, compression: str) -> int:
+    rnd = random.Random(files * size)
+    tar_path = path if compression in ["xz", "gz"] else f"{path}.tar"
+    mode = {"xz": "w:xz", "gz": "w:gz"}.get(compression, "w")
+
+    with tarfile.open(tar_path, mode) as tar:
+        for i in range(files):
+            info = tarfile.TarInfo(f"usr/share/bench/{i % 100:02d}/file-{i}")
+            data = make_payload(size, rnd)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+    if compression == "zst":
+        subprocess.check_call(["zstd", "-q", "-f", tar_path, "-o", path])
+        os.remove(tar_path)
+
+    return files * size
+
+
+def legacy_unpack(path: str, destination: str):
+    with tarfile.open(path) as tar:
+        for member in tar.getmembers():
+            member_path = os.path.join(destination, member.name)
+            if os.path.commonprefix([os.path.abspath(destination), os.path.abspath(member_path)]) \
+                    != os.path.abspath(destination):
+                raise Exception("Attempted Path Traversal in Tar File")
+        tar.extractall(destination)
+
+
+def streaming_unpack(path: str, destination: str):
+    ArchiveUtils.extract(path, destination)
+
+
+def measure(unpack_fn: callable, path: str, tmp: str, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        destination = tempfile.mkdtemp(dir=tmp)
+        start = time.monotonic()
+        unpack_fn(path, destination)
+        timings.append(time.monotonic() - start)
+        shutil.rmtree(destination)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--compression", choices=["xz", "gz", "zst"], default="xz")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    methods = [("streaming", streaming_unpack)]
+    if args.compression != "zst":  # tarfile can not read zstd by itself
+        methods.insert(0, ("legacy", legacy_unpack))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'scenario':<12} {'method':<10} {'members':>8} {'MB':>8} {'wall s':>8} {'MB/s':>8}")
+        for name, files, size in SCENARIOS:
+            path = os.path.join(tmp, f"{name}.tar.{args.compression}")
+            total = make_tarball(path, files, size, args.compression)
+            megabytes = total / 1024 / 1024
+
+            for method, unpack_fn in methods:
+                wall = measure(unpack_fn, path, tmp, args.runs)
+                print(f"{name:<12} {method:<10} {files:>8} {megabytes:>8.1f} {wall:>8.2f} {megabytes / wall:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# test_container_state.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+AtomsContainerStateTracker against a fake podman and docker, each listing
+two distrobox containers and then streaming canned container events in
+its own format, keeping the stream open like the real ones.
+"""
+
+import os
+import subprocess
+
+import pytest
+
+from atoms_core.wrappers.client_bridge import ClientBridge
+from atoms_core.wrappers.distrobox import DistroboxWrapper
+from atoms_core.entities.container_state import AtomsContainerStateTracker
+
+FAKE_PODMAN = """#!/bin/sh
+case "$1" in
+events)
+    sleep 0.2
+    echo '{"ID":"aaaaaaaaaaaa1111","Status":"died","Type":"container"}'
+    echo 'not json'
+    echo '{"ID":"aaaaaaaaaaaa1111","Status":"stop","Type":"container"}'
+    echo '{"ID":"dddddddddddd","Status":"create","Type":"container"}'
+    echo '{"ID":"dddddddddddd","Status":"start","Type":"container"}'
+    echo '{"ID":"cccccccccccc","Status":"remove","Type":"container"}'
+    exec sleep 30;;
+ps)
+    echo '[{"Id":"aaaaaaaaaaaa1111","Image":"fedora","Names":["box"],\
+"Created":1667296800,"State":"running","Labels":{"manager":"distrobox"}},\
+{"Id":"cccccccccccc","Image":"ubuntu","Names":["u"],"Created":1667296900,\
+"State":"exited","Labels":{"manager":"distrobox"}}]';;
+esac
+"""
+
+FAKE_DOCKER = """#!/bin/sh
+case "$1" in
+events)
+    sleep 0.2
+    echo '{"status":"kill","id":"aaaaaaaaaaaa1111","Type":"container","Action":"kill"}'
+    echo '{"status":"die","id":"aaaaaaaaaaaa1111","Type":"container","Action":"die"}'
+    echo '{"status":"create","id":"dddddddddddd","Type":"container","Action":"create"}'
+    echo '{"status":"start","id":"dddddddddddd","Type":"container","Action":"start"}'
+    echo '{"status":"destroy","id":"cccccccccccc","Type":"container","Action":"destroy"}'
+    exec sleep 30;;
+ps)
+    echo '{"ID":"aaaaaaaaaaaa1111","Image":"fedora","Names":"box",\
+"CreatedAt":"2022-11-01 10:00:00 +0100 CET","State":"running",\
+"Labels":"manager=distrobox"}'
+    echo '{"ID":"cccccccccccc","Image":"ubuntu","Names":"u",\
+"CreatedAt":"2022-11-01 10:05:00 +0100 CET","State":"exited",\
+"Labels":"manager=distrobox"}';;
+esac
+"""
+
+
+class FakeInstance:
+    client_bridge = ClientBridge()
+
+
+@pytest.fixture
+def engines(tmp_path, monkeypatch):
+    for engine, script in (("podman", FAKE_PODMAN), ("docker", FAKE_DOCKER)):
+        path = tmp_path / engine
+        path.write_text(script)
+        path.chmod(0o755)
+
+    # the listing must go through the fake engines
+    monkeypatch.setenv("ATOMS_NO_PODMAN_API", "1")
+    monkeypatch.setenv("PATH", f"{tmp_path}:{os.environ['PATH']}")
+    DistroboxWrapper.containers_cache.invalidate()
+    yield tmp_path
+    DistroboxWrapper.containers_cache.invalidate()
+
+
+@pytest.mark.parametrize("engine", ["podman", "docker"])
+def test_states(engines, engine, monkeypatch):
+    monkeypatch.setenv("DBX_CONTAINER_MANAGER", engine)
+
+    changes = []
+    tracker = AtomsContainerStateTracker(
+        FakeInstance(), lambda *args: changes.append(args))
+    tracker.start()
+    try:
+        assert tracker.get_state("cccccccccccc") == "exited"
+        assert tracker.wait_for("aaaaaaaaaaaa", ["exited"], 5)
+        assert tracker.wait_for("cccccccccccc", ["removed"], 5)
+        assert tracker.wait_for("dddddddddddd", ["running"], 5)
+        assert tracker.states == {
+            "aaaaaaaaaaaa": "exited", "dddddddddddd": "running"}
+        assert ("cccccccccccc", "removed") in changes
+    finally:
+        tracker.stop()
+
+    assert not tracker.is_running
+
+
+def test_failed_listing(engines, monkeypatch):
+    def get_containers(self, name: str = None):
+        raise OSError("no engine")
+
+    processes = []
+
+    class Popen(subprocess.Popen):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            processes.append(self)
+
+    monkeypatch.setenv("DBX_CONTAINER_MANAGER", "podman")
+    monkeypatch.setattr(DistroboxWrapper, "get_containers", get_containers)
+    monkeypatch.setattr(subprocess, "Popen", Popen)
+
+    tracker = AtomsContainerStateTracker(FakeInstance())
+    with pytest.raises(OSError):
+        tracker.start()
+    assert not tracker.is_running
+
+    # the events stream is not left behind
+    assert len(processes) == 1
+    assert processes[0].returncode is not None
@@ -0,0 +1,177 @@
+# test_containers.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+The distrobox containers listing against a fake Podman API, listening on
+a Unix socket and answering /_ping and /containers/json (with the label
+and name filters) from canned data, and through the CLI of a fake docker
+when distrobox is told to use it.
+"""
+
+import os
+import json
+import time
+import threading
+import http.server
+import socketserver
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+from atoms_core.utils.container import ContainerUtils
+from atoms_core.wrappers.distrobox import DistroboxWrapper
+from atoms_core.wrappers.podman_api import PodmanApiClient
+
+CONTAINERS = [
+    {
+        "Id": "a" * 64,
+        "Image": "registry.fedoraproject.org/fedora-toolbox:37",
+        "Names": ["box"],
+        "Created": "2022-11-01T10:00:00.123456789Z",
+        "State": "running",
+        "Labels": {"manager": "distrobox"},
+    },
+    {
+        "Id": "b" * 64,
+        "Image": "docker.io/library/alpine",
+        "Names": ["other"],
+        "Created": "2022-10-01T10:00:00Z",
+        "State": "exited",
+        "Labels": {},
+    },
+]
+
+# what 'docker ps --format "{{json .}}"' prints for a distrobox container
+FAKE_DOCKER = """#!/bin/sh
+echo '{"ID":"cccccccccccccccc","Image":"alpine","Names":"dockerbox",\
+"CreatedAt":"2022-11-01 10:00:00 +0100 CET","State":"running",\
+"Labels":"manager=distrobox"}'
+"""
+
+
+class FakeApiHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def address_string(self) -> str:
+        return "unix"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.endswith("/_ping"):
+            self.reply(200, b"OK", "text/plain")
+        elif url.path.endswith("/containers/json"):
+            filters = json.loads(parse_qs(url.query).get("filters", ["{}"])[0])
+            self.reply(200, json.dumps(self.filter(filters)).encode())
+        else:
+            self.reply(404, b'{"message": "no such endpoint"}')
+
+    @staticmethod
+    def filter(filters: dict) -> list:
+        containers = CONTAINERS
+        for label in filters.get("label", []):
+            key, _, value = label.partition("=")
+            containers = [
+                c for c in containers if c["Labels"].get(key) == value]
+        for name in filters.get("name", []):
+            containers = [
+                c for c in containers if c["Names"][0] == name.strip("^$")]
+        return containers
+
+    def reply(self, status: int, body: bytes,
+              content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeApiServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def api_socket(tmp_path, monkeypatch):
+    socket_path = str(tmp_path / "podman.sock")
+    server = FakeApiServer(socket_path, FakeApiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    monkeypatch.setenv("CONTAINER_HOST", f"unix://{socket_path}")
+    monkeypatch.delenv("DBX_CONTAINER_MANAGER", raising=False)
+    monkeypatch.delenv("ATOMS_NO_PODMAN_API", raising=False)
+    monkeypatch.delenv("FLATPAK_ID", raising=False)
+    monkeypatch.setattr(PodmanApiClient, "_PodmanApiClient__default", None)
+    DistroboxWrapper.containers_cache.invalidate()
+
+    yield socket_path
+
+    DistroboxWrapper.containers_cache.invalidate()
+    server.shutdown()
+    server.server_close()
+
+
+def test_api_client(api_socket):
+    api = PodmanApiClient(api_socket)
+    assert api.is_supported and api.ping()
+    assert len(api.list_containers()) == len(CONTAINERS)
+    assert api.list_containers({"name": ["^other$"]})[0]["Id"] == "b" * 64
+    api.close()
+
+
+def test_distrobox_containers_from_api(api_socket):
+    containers = DistroboxWrapper().get_containers()
+    assert list(containers) == ["a" * 12]
+    assert containers["a" * 12]["name"] == "box"
+    assert containers["a" * 12]["state"] == "running"
+    assert DistroboxWrapper().get_containers("nope") == {}
+
+
+def test_distrobox_containers_with_docker(api_socket, tmp_path, monkeypatch):
+    # the podman socket is there, but distrobox uses docker
+    docker = tmp_path / "docker"
+    docker.write_text(FAKE_DOCKER)
+    docker.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}:{os.environ['PATH']}")
+    monkeypatch.setenv("DBX_CONTAINER_MANAGER", "docker")
+
+    containers = DistroboxWrapper().get_containers()
+    assert [c["name"] for c in containers.values()] == ["dockerbox"]
+
+
+@pytest.fixture
+def utc(monkeypatch):
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2022-11-01T10:00:00Z", "2022-11-01T10:00:00.000000"),
+    ("2022-11-01T10:00:00.1Z", "2022-11-01T10:00:00.100000"),
+    ("2022-11-01T10:00:00.12Z", "2022-11-01T10:00:00.120000"),
+    ("2022-11-01T10:00:00.1234z", "2022-11-01T10:00:00.123400"),
+    ("2022-11-01T11:00:00.12345+01:00", "2022-11-01T10:00:00.123450"),
+    ("2022-11-01T10:00:00.123456789Z", "2022-11-01T10:00:00.123456"),
+    ("2022-11-01 11:00:00 +0100 CET", "2022-11-01T10:00:00.000000"),
+])
+def test_format_date(utc, value, expected):
+    assert ContainerUtils.format_date(value) == expected
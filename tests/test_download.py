@@ -0,0 +1,209 @@
+# test_download.py
+#
+# Copyright 2022 mirkobrombin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundationat version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+DownloadUtils against a local HTTP server: segmented downloads, resuming
+an interrupted one from its .part files, teed downloads and the single
+stream fallback for remotes without Range support.
+"""
+
+import io
+import os
+import json
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from atoms_core.models.instance import AtomsInstanceModel
+from atoms_core.wrappers.client_bridge import ClientBridge
+from atoms_core.utils.download import DownloadUtils
+from atoms_core.exceptions.download import AtomsHashMissmatchError
+
+DATA = os.urandom(1024 * 1024)
+DATA_HASH = hashlib.sha256(DATA).hexdigest()
+CHUNK = 16 * 1024
+
+
+class RangeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), RangeHandler)
+        self.ranges = True      # advertise Accept-Ranges
+        self.honour = True      # answer Range requests with 206
+        self.cut_after = None   # close each response after this many bytes
+        self.requests = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}/image.tar"
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(DATA)))
+        if self.server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", '"v1"')
+        self.end_headers()
+
+    def do_GET(self):
+        requested = self.headers.get("Range")
+        self.server.requests.append(requested)
+
+        start, end = 0, len(DATA) - 1
+        if requested and self.server.honour:
+            first, _, last = requested[len("bytes="):].partition("-")
+            start, end = int(first), int(last or end)
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {start}-{end}/{len(DATA)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(end + 1 - start))
+        self.end_headers()
+
+        for offset in range(start, end + 1, CHUNK):
+            if self.server.cut_after is not None \
+                    and offset - start >= self.server.cut_after:
+                self.close_connection = True
+                return
+            self.wfile.write(DATA[offset:min(offset + CHUNK, end + 1)])
+
+
+@pytest.fixture
+def server():
+    server = RangeServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def instance():
+    return AtomsInstanceModel(None, ClientBridge())
+
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    monkeypatch.setattr(DownloadUtils, "min_segment_size", 128 * 1024)
+
+
+def download(instance, server, path, hash_value=DATA_HASH, tee=None) -> bool:
+    return DownloadUtils(
+        instance, server.url, path, hash_value=hash_value,
+        hash_type="sha256", tee=tee).download()
+
+
+def read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_segmented(instance, server, tmp_path):
+    path = str(tmp_path / "image.tar")
+
+    assert download(instance, server, path)
+    assert read(path) == DATA
+    assert len(server.requests) == DownloadUtils.segments
+    assert all(request.startswith("bytes=") for request in server.requests)
+    assert not os.path.exists(f"{path}.part")
+    assert not os.path.exists(f"{path}.part.json")
+
+
+def test_resume_segmented(instance, server, tmp_path):
+    path = str(tmp_path / "image.tar")
+
+    server.cut_after = 4 * CHUNK
+    assert not download(instance, server, path)
+    with open(f"{path}.part.json") as f:
+        segments = json.load(f)["segments"]
+    assert 0 < sum(segment["done"] for segment in segments) < len(DATA)
+
+    server.cut_after = None
+    server.requests.clear()
+    assert download(instance, server, path)
+    assert read(path) == DATA
+
+    # only the missing part of each segment is requested again
+    resumed = [int(r[len("bytes="):].partition("-")[0]) for r in server.requests]
+    assert sorted(resumed) == [
+        s["start"] + s["done"] for s in segments
+        if s["start"] + s["done"] <= s["end"]
+    ]
+
+
+def test_resume_teed(instance, server, tmp_path):
+    path = str(tmp_path / "image.tar")
+
+    server.cut_after = 4 * CHUNK
+    assert not download(instance, server, path, tee=io.BytesIO())
+    with open(f"{path}.part.json") as f:
+        done = json.load(f)["segments"][0]["done"]
+
+    server.cut_after = None
+    server.requests.clear()
+    tee = io.BytesIO()
+    assert download(instance, server, path, tee=tee)
+    assert tee.getvalue() == DATA
+    assert server.requests == [f"bytes={done}-{len(DATA) - 1}"]
+
+
+def test_no_range_support(instance, server, tmp_path):
+    path = str(tmp_path / "image.tar")
+
+    server.ranges = False
+    assert download(instance, server, path)
+    assert read(path) == DATA
+    assert server.requests == [None]
+
+
+def test_range_ignored(instance, server, tmp_path):
+    path = str(tmp_path / "image.tar")
+
+    server.honour = False
+    assert download(instance, server, path)
+    assert read(path) == DATA
+    assert server.requests[-1] is None
+
+
+def test_short_stream(instance, server, tmp_path):
+    path = str(tmp_path / "image.tar")
+
+    server.ranges = False
+    server.cut_after = 4 * CHUNK
+    assert not download(instance, server, path, hash_value=None)
+    assert not os.path.exists(path)
+
+
+def test_hash_mismatch(instance, server, tmp_path):
+    path = str(tmp_path / "image.tar")
+
+    with pytest.raises(AtomsHashMissmatchError):
+        download(instance, server, path, hash_value="0" * 64)
+    assert not os.path.exists(path)
+    assert not os.path.exists(f"{path}.part")
+    assert not os.path.exists(f"{path}.part.json")